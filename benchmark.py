@@ -7,9 +7,9 @@
 
 import argparse
 import os
-import ctypes
 
-from src.utils.bench_utils import cBenchResult, Benchmark
+from src.utils.bench_utils import load_library, Benchmark, WORKLOADS
+from src.utils.shm_utils import MultiProcessBenchmark, DEFAULT_SEGMENT_SIZE
 
 
 def main():
@@ -84,6 +84,41 @@ def main():
         default=0,
         help="Number of items to prefill before benchmarking, e.g., --prefill-count 1000.",
     )
+    parser.add_argument(
+        "--prefill-from",
+        type=str,
+        default=None,
+        help="Snapshot file to load the prefilled list from. If it does not exist yet, "
+        "the list is prefilled as usual and the snapshot is written there for later runs.",
+    )
+    parser.add_argument(
+        "--workload",
+        type=str,
+        choices=WORKLOADS,
+        default="set",
+        help="Benchmark the skiplist as a set, or as a priority queue where the delete "
+        "share of the operations mix pops the minimum (queue) or a random key near "
+        "the minimum via spray_pop (relaxed_queue).",
+    )
+    parser.add_argument(
+        "--persistent",
+        action="store_true",
+        help="Create and prefill the list once and run all points of the sweep as "
+        "phases on that same list, instead of a fresh list per point.",
+    )
+    parser.add_argument(
+        "--multi-process",
+        action="store_true",
+        help="Run every point with worker processes attached to one shared list "
+        "instead of threads (requires library_shm.so); --num-of-threads then "
+        "gives the number of processes.",
+    )
+    parser.add_argument(
+        "--segment-size",
+        type=int,
+        default=DEFAULT_SEGMENT_SIZE,
+        help="Size in bytes of the shared memory segment used with --multi-process.",
+    )
     parser.add_argument(
         "--basedir",
         type=str,
@@ -103,11 +138,24 @@ def main():
     lib_path = os.path.join(this_dir, "build", args.library)
     if not os.path.exists(lib_path):
         raise FileNotFoundError(f"Shared library not found at: {lib_path}")
-    binary = ctypes.CDLL(lib_path)
-    binary.bench.restype = cBenchResult
 
-    bench = Benchmark(
-        bench_function=binary.bench,
+    if args.multi_process and args.persistent:
+        parser.error("--persistent is not supported with --multi-process")
+
+    if args.multi_process:
+        bench_class = MultiProcessBenchmark
+        bench_args = {"lib_path": lib_path, "segment_size": args.segment_size}
+    else:
+        binary = load_library(lib_path)
+        bench_class = Benchmark
+        bench_args = {
+            "bench_function": binary.bench,
+            "library": binary,
+            "persistent": args.persistent,
+        }
+
+    bench = bench_class(
+        **bench_args,
         repetitions_per_point=args.repetitions_per_point,
         num_of_threads=args.num_of_threads,
         base_range=args.base_range,
@@ -118,6 +166,8 @@ def main():
         basic_testing=args.basic_testing,
         seed=args.seed,
         prefill_count=args.prefill_count,
+        prefill_from=args.prefill_from,
+        workload=args.workload,
         basedir=args.basedir,
         name=args.name,
     )
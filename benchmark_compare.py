@@ -0,0 +1,202 @@
+##
+# @file benchmark_compare.py
+# @author Natalia Tylek (12332258), Marlene Riegel (01620782), Maximilian Kleinegger (12041500)
+# @date 2025-01-13
+#
+# @brief This script runs all built skiplist variants interleaved point by point and compares
+# the results against the stored baselines in data/, exiting non-zero on significant regressions.
+
+import argparse
+import os
+import sys
+
+from src.utils.bench_utils import load_library, Benchmark
+from src.utils.compare_utils import (
+    discover_implementations,
+    load_baseline,
+    compare,
+    format_table,
+)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Compare all built skiplist variants against the baselines in data/."
+    )
+    parser.add_argument(
+        "--implementations",
+        type=str,
+        nargs="+",
+        default=None,
+        help="Implementations to compare, e.g. --implementations fine_lock lock_free. "
+        "Defaults to all variants built in build/.",
+    )
+    parser.add_argument(
+        "--repetitions-per-point",
+        type=int,
+        default=3,
+        help="Number of repetitions per point.",
+    )
+    parser.add_argument(
+        "--num-of-threads",
+        type=int,
+        nargs="+",
+        default=[1, 2, 4, 8],
+        help="List of thread counts to test, e.g. --num-of-threads 1 2 4 8.",
+    )
+    parser.add_argument(
+        "--base-range",
+        type=int,
+        nargs=2,
+        default=[0, 100000],
+        help="Lower and upper bound for the key range, e.g. --base-range 0 100000.",
+    )
+    parser.add_argument(
+        "--runtime-in-sec",
+        type=int,
+        nargs="+",
+        default=[1],
+        help="List of run times in seconds, e.g. --runtime-in-sec 1 5.",
+    )
+    parser.add_argument(
+        "--operations-mix",
+        type=float,
+        nargs=3,
+        action="append",
+        help="(Insert%%, Delete%%, Contains%%), may be given multiple times. "
+        "Defaults to 40 40 20 and 10 10 80.",
+    )
+    parser.add_argument(
+        "--disjoint-range",
+        action="store_true",
+        help="Use disjoint range if set; otherwise shared range.",
+    )
+    parser.add_argument(
+        "--selection-strategy",
+        type=int,
+        default=0,
+        help="Selection strategy (0 => random, 1 => deterministic, 2 => random unique).",
+    )
+    parser.add_argument(
+        "--seed",
+        type=int,
+        default=42,
+        help="Random seed.",
+    )
+    parser.add_argument(
+        "--prefill-count",
+        type=int,
+        default=0,
+        help="Number of items to prefill before benchmarking, e.g., --prefill-count 1000.",
+    )
+    parser.add_argument(
+        "--alpha",
+        type=float,
+        default=0.05,
+        help="Significance level of Welch's t-test.",
+    )
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=0.05,
+        help="Minimal relative throughput change to report, e.g. 0.05 for 5%%.",
+    )
+    parser.add_argument(
+        "--basedir",
+        type=str,
+        default=".",
+        help="Base directory containing the data/ baselines.",
+    )
+
+    args = parser.parse_args()
+    operations_mixes = args.operations_mix or [[40, 40, 20], [10, 10, 80]]
+    range_type = "disjoint" if args.disjoint_range else "shared"
+
+    this_dir = os.path.dirname(os.path.abspath(__file__))
+    implementations = discover_implementations(os.path.join(this_dir, "build"))
+    binaries = {}
+    for implementation in args.implementations or list(implementations):
+        if implementation not in implementations:
+            print(f"Warning: no library built for implementation: {implementation}")
+            continue
+        binaries[implementation] = load_library(implementations[implementation])
+
+    rows = []
+    for operations_mix in operations_mixes:
+        op_mix = "".join(str(int(p)) for p in operations_mix)
+        benches = {
+            implementation: Benchmark(
+                bench_function=binary.bench,
+                repetitions_per_point=args.repetitions_per_point,
+                num_of_threads=args.num_of_threads,
+                base_range=args.base_range,
+                runtime_in_sec=args.runtime_in_sec,
+                operations_mix=operations_mix,
+                disjoint_range=args.disjoint_range,
+                selection_strategy=args.selection_strategy,
+                basic_testing=False,
+                seed=args.seed,
+                prefill_count=args.prefill_count,
+                basedir=args.basedir,
+                name=implementation,
+            )
+            for implementation, binary in binaries.items()
+        }
+
+        for runtime in args.runtime_in_sec:
+            for threads in args.num_of_threads:
+                point = [
+                    name
+                    for name in benches
+                    if threads == 1 or name != "sequential"
+                ]
+                samples = {name: [] for name in point}
+
+                # Interleave the implementations and rotate their order, such
+                # that machine drift affects all of them alike
+                for rep in range(args.repetitions_per_point):
+                    shift = rep % len(point)
+                    for name in point[shift:] + point[:shift]:
+                        result = benches[name].run_point(threads, runtime)
+                        samples[name].append(result.total_operations / result.time)
+
+                for name in point:
+                    baseline = load_baseline(
+                        args.basedir, name, op_mix, range_type, runtime, threads
+                    )
+                    row = compare(samples[name], baseline, args.alpha, args.threshold)
+                    row.update(
+                        implementation=name,
+                        op_mix=op_mix,
+                        range_type=range_type,
+                        runtime=runtime,
+                        threads=threads,
+                    )
+                    rows.append(row)
+                    print(
+                        f"{name} {op_mix}_{range_type} {runtime}s {threads} threads: {row['status']}",
+                        flush=True,
+                    )
+
+    print()
+    print(format_table(rows))
+
+    # Points that could not be tested must not look like a clean run
+    unchecked = {}
+    for row in rows:
+        if row["status"] in ("no baseline", "too few samples"):
+            key = (row["implementation"], row["status"])
+            unchecked[key] = unchecked.get(key, 0) + 1
+    if unchecked:
+        print("\nWARNING: the following points were NOT checked for regressions:", file=sys.stderr)
+        for (implementation, status), count in sorted(unchecked.items()):
+            print(f"WARNING:   {implementation}: {count} point(s), {status}", file=sys.stderr)
+
+    regressions = [row for row in rows if row["status"] == "regression"]
+    if regressions:
+        print(f"\n{len(regressions)} significant throughput regression(s) found.")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -7,9 +7,8 @@
 
 import argparse
 import os
-import ctypes
 
-from src.utils.bench_utils import cBenchResult, Benchmark
+from src.utils.bench_utils import load_library, Benchmark
 
 
 def benchmark_all():
@@ -45,8 +44,7 @@ def benchmark_all():
             print(f"Warning: library not found: {lib_path}")
             continue
 
-        binary = ctypes.CDLL(lib_path)
-        binary.bench.restype = cBenchResult
+        binary = load_library(lib_path)
 
         for disjoint in disjoint_types:
             for op_mix in mixes:
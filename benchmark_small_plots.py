@@ -6,7 +6,7 @@
 # @brief This script generates plots for the benchmark_small specified in the task description.
 
 
-from src.utils.plot_utils import load_and_prepare_data, enrich_df, plot_throughput, plot_success_ratio_all_implementations, plot_total_vs_successful_operations_all_implementations, explode_average_ops_per_thread
+from src.utils.plot_utils import load_and_prepare_data, enrich_df, plot_throughput, plot_success_ratio_all_implementations, plot_total_vs_successful_operations_all_implementations, explode_average_ops_per_thread, plot_scalability_fit
 import pandas as pd
 import seaborn as sns
 import matplotlib.pyplot as plt
@@ -50,6 +50,7 @@ def main():
     plot_throughput(final_df, "101080", "shared", 1, store=True, base_path="./plots/")
     plot_success_ratio_all_implementations(final_df, ('Inserts', 'total_inserts', 'successful_inserts'), "101080", "shared", 1, store=True, base_path="./plots/")
     plot_total_vs_successful_operations_all_implementations(final_df, ('Inserts', 'total_inserts', 'successful_inserts'), "101080", "shared", 1, store=True, base_path="./plots/")
+    plot_scalability_fit(final_df, "101080", "shared", 1, store=True, base_path="./plots/")
     
    
 if __name__ == "__main__":
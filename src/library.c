@@ -15,14 +15,47 @@
 #include <string.h>
 #include <unistd.h>
 #include <time.h>
+#include <fcntl.h>
+#include <sys/mman.h>
+#include <sys/stat.h>
 
 #include "skiplist.h"
 
 // #define VERBOSE
 #define INC(_c) ((_c)++)
+#define SNAPSHOT_MAGIC 0x50414e53504b53L // "SKPSNAP"
+#define SNAPSHOT_VERSION 1
+// Number of increments and decrements timed to measure the cost of update_size
+#define SIZE_CALIBRATION_UPDATES 100000
+
+// Workloads of the benchmark driver. The queue workloads use the delete share
+// of the operations mix for delete_min, or spray_pop in the relaxed one.
+#define WORKLOAD_SET 0
+#define WORKLOAD_QUEUE 1
+#define WORKLOAD_RELAXED_QUEUE 2
+
+// Version of the layout of bench_result and thread_result. Callers check it
+// through bench_result_version() before calling into the library.
+#define BENCH_RESULT_VERSION 2
+
+// Counters of a single thread of a run. Callers pass a buffer with one entry
+// per requested thread, or NULL if they only need the totals.
+struct thread_result
+{
+    long long operations;
+    long long inserts;
+    long long successful_inserts;
+    long long deletes;
+    long long successful_deletes;
+    long long contains;
+    long long successful_contains;
+    double time;
+};
 
 struct bench_result
 {
+    int version;
+    int threads;
     float time;
     long long total_operations;
     long long total_inserts;
@@ -32,17 +65,190 @@ struct bench_result
     long long total_contains;
     long long successful_contains;
     int basic_correctness_test_success;
-    long long operations_per_thread[64];
+    long long live_keys;
+    long long marked_nodes;
+    long long nodes_per_level[MAX_LEVEL];
+    double avg_search_path_length;
+    long long bytes_allocated;
+    double prefill_time;
+    long long size;
+    int size_check_success;
+    double size_update_ns;
+    double size_overhead;
+};
+
+// A list that outlives a single measurement, such that several phases with
+// different thread counts and mixes run on the same, aging structure.
+struct bench_session
+{
+    skiplist *list;
+    int basic_correctness_test_success;
+};
+
+// Snapshot files consist of this header, followed by `count` ascending keys
+// (long) and `count` tower heights (unsigned char).
+struct snapshot_header
+{
+    long magic;
+    int version;
+    int max_level;
+    long count;
 };
 
+struct snapshot_buffer
+{
+    long *keys;
+    unsigned char *levels;
+    long count;
+    long capacity;
+    int failed;
+};
+
+#ifdef STRING_KEYS
+#define STRING_KEY_MAX 64
+
+// Benchmark key generator for string workloads. Maps an integer key to an
+// ID-like key "<16 hex digits of the scrambled key>/item/<key>".
+size_t string_key(long key, unsigned char *buf)
+{
+    static const char digits[] = "0123456789abcdef";
+    unsigned long scrambled = (unsigned long)key * 0x9E3779B97F4A7C15UL;
+    size_t length = 0;
+    for (int shift = 60; shift >= 0; shift -= 4)
+    {
+        buf[length++] = digits[(scrambled >> shift) & 0xf];
+    }
+    memcpy(buf + length, "/item/", 6);
+    length += 6;
+
+    char decimal[24];
+    int n = 0;
+    unsigned long rest = (unsigned long)key;
+    do
+    {
+        decimal[n++] = '0' + rest % 10;
+        rest /= 10;
+    } while (rest > 0);
+    while (n > 0)
+    {
+        buf[length++] = decimal[--n];
+    }
+    return length;
+}
+
+int add_key(skiplist *list, long key)
+{
+    unsigned char buf[STRING_KEY_MAX];
+    size_t length = string_key(key, buf);
+    return add(list, buf, length, NULL);
+}
+
+int rem_key(skiplist *list, long key)
+{
+    unsigned char buf[STRING_KEY_MAX];
+    size_t length = string_key(key, buf);
+    return rem(list, buf, length);
+}
+
+int con_key(skiplist *list, long key)
+{
+    unsigned char buf[STRING_KEY_MAX];
+    size_t length = string_key(key, buf);
+    return con(list, buf, length);
+}
+
+int pop_key(skiplist *list, int workload)
+{
+    unsigned char buf[STRING_KEY_MAX];
+    size_t length;
+    if (workload == WORKLOAD_RELAXED_QUEUE)
+        return spray_pop(list, omp_get_num_threads(), buf, sizeof(buf), &length);
+    return delete_min(list, buf, sizeof(buf), &length);
+}
+
+int reversed_order(const unsigned char *a, size_t a_length, const unsigned char *b, size_t b_length)
+{
+    int result = memcmp(a, b, a_length < b_length ? a_length : b_length);
+    if (result != 0)
+    {
+        return -result;
+    }
+    return (a_length < b_length) - (a_length > b_length);
+}
+
+// Inserts the keys k000, k002, ..., k198 as one batch, removes the range from
+// k050 to k148 and checks the remaining keys, their order and the size. With
+// reversed set, the list is ordered by reversed_order and the bounds are swapped.
+int string_batch_test(skiplist *list, int reversed)
+{
+    char keys[100][16];
+    const unsigned char *batch[100];
+    size_t lengths[100];
+    for (int j = 0; j < 100; j++)
+    {
+        snprintf(keys[j], sizeof(keys[j]), "k%03d", reversed ? 2 * (99 - j) : 2 * j);
+        batch[j] = (const unsigned char *)keys[j];
+        lengths[j] = strlen(keys[j]);
+    }
+
+    set_comparator(list, reversed ? reversed_order : NULL);
+    int valid = add_sorted_batch(list, batch, lengths, 100) == 100;
+    valid &= add_sorted_batch(list, batch, lengths, 100) == 0;
+    if (reversed)
+        valid &= rem_range(list, (const unsigned char *)"k148", 4, (const unsigned char *)"k048", 4) == 50;
+    else
+        valid &= rem_range(list, (const unsigned char *)"k050", 4, (const unsigned char *)"k150", 4) == 50;
+
+    char key[16];
+    for (int j = 0; j < 200; j++)
+    {
+        snprintf(key, sizeof(key), "k%03d", j);
+        valid &= con(list, (const unsigned char *)key, strlen(key)) == (j % 2 == 0 && (j < 50 || j >= 150));
+    }
+    valid &= size(list) == 50;
+
+    unsigned char previous[STRING_KEY_MAX], current[STRING_KEY_MAX];
+    size_t previous_length = 0, current_length;
+    for (int j = 0; j < 50; j++)
+    {
+        valid &= delete_min(list, current, sizeof(current), &current_length) == 1;
+        if (j > 0)
+        {
+            int order = reversed ? reversed_order(previous, previous_length, current, current_length)
+                                 : memcmp(previous, current, 4);
+            valid &= order < 0;
+        }
+        memcpy(previous, current, current_length);
+        previous_length = current_length;
+    }
+    valid &= delete_min(list, current, sizeof(current), &current_length) == 0;
+    valid &= size(list) == 0;
+
+    set_comparator(list, NULL);
+    return valid;
+}
+#else
+#define add_key(_list, _key) add(_list, _key, NULL)
+#define rem_key(_list, _key) rem(_list, _key)
+#define con_key(_list, _key) con(_list, _key)
+
+int pop_key(skiplist *list, int workload)
+{
+    long key;
+    if (workload == WORKLOAD_RELAXED_QUEUE)
+        return spray_pop(list, omp_get_num_threads(), &key);
+    return delete_min(list, &key);
+}
+#endif
+
 int basic_correctness_test(skiplist *list)
 {
     int valid = 1;
     for (int key = 0; key < 100; key++)
     {
-        valid &= con(list, key) == 0;
-        valid &= add(list, key, NULL) == 1;
-        valid &= con(list, key) == 1;
+        valid &= con_key(list, key) == 0;
+        valid &= add_key(list, key) == 1;
+        valid &= con_key(list, key) == 1;
     }
 
     if (valid == 0)
@@ -53,11 +259,13 @@ int basic_correctness_test(skiplist *list)
         return 0;
     }
 
+    valid &= size(list) == 100 && llabs(approximate_size(list) - 100) < SIZE_BATCH;
+
     for (int key = 0; key < 100; key += 1)
     {
-        valid &= con(list, key) == 1;
-        valid &= rem(list, key) == 1;
-        valid &= con(list, key) == 0;
+        valid &= con_key(list, key) == 1;
+        valid &= rem_key(list, key) == 1;
+        valid &= con_key(list, key) == 0;
     }
 
     if (valid == 0)
@@ -70,10 +278,11 @@ int basic_correctness_test(skiplist *list)
 
     for (int key = 0; key < 100; key++)
     {
-        valid &= con(list, key) == 0;
+        valid &= con_key(list, key) == 0;
     }
 
-    valid &= con(list, 999) == 0;
+    valid &= con_key(list, 999) == 0;
+    valid &= size(list) == 0;
     if (valid == 0)
     {
 #ifdef VERBOSE
@@ -82,12 +291,108 @@ int basic_correctness_test(skiplist *list)
         return 0;
     }
 
+    for (int key = 99; key >= 0; key--)
+    {
+        valid &= add_key(list, key) == 1;
+    }
+#ifdef STRING_KEYS
+    for (int key = 0; key < 100; key++)
+    {
+        valid &= pop_key(list, WORKLOAD_QUEUE) == 1;
+    }
+#else
+    for (int key = 0; key < 100; key++)
+    {
+        long min = -1;
+        valid &= delete_min(list, &min) == 1 && min == key;
+    }
+#endif
+    valid &= pop_key(list, WORKLOAD_QUEUE) == 0;
+    if (valid == 0)
+    {
+#ifdef VERBOSE
+        printf("Basic correctness test: Delete min FAILED.\n");
+#endif
+        return 0;
+    }
+
+#ifdef STRING_KEYS
+    valid &= string_batch_test(list, 0);
+    valid &= string_batch_test(list, 1);
+#else
+    long batch[100];
+    for (int key = 0; key < 100; key++)
+    {
+        batch[key] = 2 * key;
+    }
+    valid &= add_sorted_batch(list, batch, 100) == 100;
+    valid &= add_sorted_batch(list, batch, 100) == 0;
+    valid &= rem_range(list, 50, 150) == 50;
+    for (int key = 0; key < 200; key++)
+    {
+        valid &= con_key(list, key) == (key % 2 == 0 && (key < 50 || key >= 150));
+    }
+    valid &= rem_range(list, 0, 200) == 50;
+#endif
+    if (valid == 0)
+    {
+#ifdef VERBOSE
+        printf("Basic correctness test: Batches FAILED.\n");
+#endif
+        return 0;
+    }
+
+#ifdef BACKGROUND_INDEX
+    // The maintenance thread walks level 0 while the list is built
+    long bulk_count = 100000;
+    long *bulk_keys = malloc(bulk_count * sizeof(long));
+    unsigned char *bulk_levels = malloc(bulk_count);
+    if (!bulk_keys || !bulk_levels)
+    {
+        fprintf(stderr, "Memory allocation failed for the bulk load test.\n");
+        exit(EXIT_FAILURE);
+    }
+    for (long j = 0; j < bulk_count; j++)
+    {
+        bulk_keys[j] = 2 * j;
+        bulk_levels[j] = __builtin_ctzl(j + 1) % MAX_LEVEL;
+    }
+    valid &= build_sorted(list, bulk_keys, bulk_levels, bulk_count) == bulk_count;
+    valid &= size(list) == bulk_count;
+    for (long key = 0; key < 2 * bulk_count; key += 997)
+    {
+        valid &= con_key(list, key) == (key % 2 == 0);
+    }
+    valid &= rem_range(list, 0, 2 * bulk_count) == bulk_count;
+    free(bulk_keys);
+    free(bulk_levels);
+    if (valid == 0)
+    {
+#ifdef VERBOSE
+        printf("Basic correctness test: Bulk load FAILED.\n");
+#endif
+        return 0;
+    }
+#endif
+
 #ifdef VERBOSE
     printf("Basic correctness test: SUCCESS.\n");
 #endif
     return 1;
 }
 
+double size_update_cost(skiplist *list)
+{
+    // Every increment is undone, so the size of the list is unchanged
+    double tic = omp_get_wtime();
+    for (int j = 0; j < SIZE_CALIBRATION_UPDATES; j++)
+    {
+        update_size(list, 1, 0);
+        update_size(list, 0, 1);
+    }
+    return (omp_get_wtime() - tic) * 1e9 / (2 * SIZE_CALIBRATION_UPDATES);
+}
+
 long *generate_unique_keys(int start, int end, unsigned int seed)
 {
     int range = end - start;
@@ -125,9 +430,10 @@ struct bench_result run_benchmark(
     int end_range,
     int selection_strategy,
     int disjoint_range,
-    int seed)
+    int seed,
+    int workload,
+    struct thread_result *per_thread)
 {
-    double tic, toc;
     float runtime = 0.0;
     long long t_ops = 0;
     long long t_adds = 0;
@@ -136,7 +442,7 @@ struct bench_result run_benchmark(
     long long s_adds = 0;
     long long s_rems = 0;
     long long s_cons = 0;
-    long long ops_threads[omp_get_max_threads()];
+    int threads = 1;
 
     long *unique_keys = NULL;
     int unique_key_index = 0;
@@ -158,10 +464,14 @@ struct bench_result run_benchmark(
         long long su_cons = 0;
 
         int thread_id = omp_get_thread_num();
+        if (thread_id == 0)
+        {
+            threads = omp_get_num_threads();
+        }
 
         int start = start_range;
         int end = end_range;
-        int step = (end - start) / omp_get_max_threads();
+        int step = (end - start) / omp_get_num_threads();
         if (disjoint_range == 1)
         {
             start = thread_id * step + start_range;
@@ -170,6 +480,7 @@ struct bench_result run_benchmark(
 
 #pragma omp barrier
         long key = 0;
+        double tic, toc;
         tic = toc = omp_get_wtime();
         while (toc - tic < runtime_in_sec)
         {
@@ -196,7 +507,7 @@ struct bench_result run_benchmark(
             int r = rand() % 100;
             if (r <= i)
             {
-                if (add(list, key, NULL))
+                if (add_key(list, key))
                 {
                     su_adds++;
                 }
@@ -205,7 +516,7 @@ struct bench_result run_benchmark(
             }
             else if (r <= i + d)
             {
-                if (rem(list, key))
+                if (workload == WORKLOAD_SET ? rem_key(list, key) : pop_key(list, workload))
                 {
                     su_rems++;
                 }
@@ -214,7 +525,7 @@ struct bench_result run_benchmark(
             }
             else if (r > i + d && r <= i + d + c)
             {
-                if (con(list, key))
+                if (con_key(list, key))
                 {
                     su_cons++;
                 }
@@ -231,11 +542,23 @@ struct bench_result run_benchmark(
         s_cons += su_cons;
         s_rems += su_rems;
         t_ops += ops;
-        ops_threads[thread_id] = ops;
         runtime += toc - tic;
+        if (per_thread != NULL)
+        {
+            per_thread[thread_id] = (struct thread_result){.operations = ops,
+                                                           .inserts = adds,
+                                                           .successful_inserts = su_adds,
+                                                           .deletes = rems,
+                                                           .successful_deletes = su_rems,
+                                                           .contains = cons,
+                                                           .successful_contains = su_cons,
+                                                           .time = toc - tic};
+        }
     }
 
-    struct bench_result counters = {.time = runtime / omp_get_max_threads(),
+    struct bench_result counters = {.version = BENCH_RESULT_VERSION,
+                                    .threads = threads,
+                                    .time = runtime / threads,
                                     .total_operations = t_ops,
                                     .total_inserts = t_adds,
                                     .successful_inserts = s_adds,
@@ -245,47 +568,124 @@ struct bench_result run_benchmark(
                                     .successful_contains = s_cons,
                                     .basic_correctness_test_success = 0};
 
-    for (int i = 0; i < omp_get_max_threads(); i++)
-    {
-        counters.operations_per_thread[i] = ops_threads[i];
-    }
+    // Every successful insert and delete updated the size counters once
+    counters.size_update_ns = size_update_cost(list);
+    if (runtime > 0)
+        counters.size_overhead = (s_adds + s_rems) * counters.size_update_ns * 1e-9 / runtime;
 
     if (unique_keys != NULL)
         free(unique_keys);
     return counters;
 }
 
-struct bench_result bench(
-    int num_of_threads,
-    int runtime_in_sec,
-    float i,
-    float d,
-    float c,
-    int start_range,
-    int end_range,
-    int disjoint_range,
-    int selection_strategy,
-    int prefill_count,
-    int basic_testing,
-    int seed)
+#ifndef STRING_KEYS
+void snapshot_append(long key, int top_level, void *arg)
 {
-    skiplist *mylist = malloc(sizeof(skiplist));
-    if (!mylist)
+    struct snapshot_buffer *buffer = arg;
+    if (buffer->failed)
+        return;
+
+    if (buffer->count == buffer->capacity)
     {
-        fprintf(stderr, "Memory allocation failed for skiplist.\n");
-        exit(EXIT_FAILURE);
+        long capacity = buffer->capacity > 0 ? 2 * buffer->capacity : 1024;
+        long *keys = realloc(buffer->keys, capacity * sizeof(long));
+        if (keys)
+            buffer->keys = keys;
+        unsigned char *levels = realloc(buffer->levels, capacity * sizeof(unsigned char));
+        if (levels)
+            buffer->levels = levels;
+        if (!keys || !levels)
+        {
+            buffer->failed = 1;
+            return;
+        }
+        buffer->capacity = capacity;
     }
-    init(mylist);
 
-    int basic_testing_result = 0;
-#pragma omp single
+    buffer->keys[buffer->count] = key;
+    buffer->levels[buffer->count] = top_level;
+    buffer->count++;
+}
+
+long snapshot(skiplist *list, const char *path)
+{
+    struct snapshot_buffer buffer = {0};
+    for_each(list, snapshot_append, &buffer);
+
+    long result = -1;
+    FILE *file = buffer.failed ? NULL : fopen(path, "wb");
+    if (file)
     {
-        if (basic_testing == 1)
+        struct snapshot_header header = {.magic = SNAPSHOT_MAGIC,
+                                         .version = SNAPSHOT_VERSION,
+                                         .max_level = MAX_LEVEL,
+                                         .count = buffer.count};
+        int written = fwrite(&header, sizeof(header), 1, file) == 1 &&
+                      fwrite(buffer.keys, sizeof(long), buffer.count, file) == (size_t)buffer.count &&
+                      fwrite(buffer.levels, sizeof(unsigned char), buffer.count, file) == (size_t)buffer.count;
+        if (fclose(file) == 0 && written)
         {
-            basic_testing_result = basic_correctness_test(mylist);
+            result = buffer.count;
         }
     }
 
+    free(buffer.keys);
+    free(buffer.levels);
+    return result;
+}
+
+long load_snapshot(skiplist *list, const char *path)
+{
+    int fd = open(path, O_RDONLY);
+    if (fd == -1)
+        return -1;
+
+    struct stat st;
+    if (fstat(fd, &st) == -1 || st.st_size < (long)sizeof(struct snapshot_header))
+    {
+        close(fd);
+        return -1;
+    }
+
+    char *data = mmap(NULL, st.st_size, PROT_READ, MAP_PRIVATE, fd, 0);
+    close(fd);
+    if (data == MAP_FAILED)
+        return -1;
+    madvise(data, st.st_size, MADV_SEQUENTIAL);
+
+    struct snapshot_header *header = (struct snapshot_header *)data;
+    int valid = header->magic == SNAPSHOT_MAGIC &&
+                header->version == SNAPSHOT_VERSION &&
+                header->max_level == MAX_LEVEL &&
+                header->count >= 0 &&
+                st.st_size == (long)sizeof(struct snapshot_header) + header->count * (long)(sizeof(long) + 1);
+
+    long *keys = (long *)(data + sizeof(struct snapshot_header));
+    unsigned char *levels = (unsigned char *)(keys + (valid ? header->count : 0));
+    for (long j = 0; valid && j < header->count; j++)
+    {
+        valid = levels[j] < MAX_LEVEL && (j == 0 || keys[j - 1] < keys[j]);
+    }
+
+    long result = -1;
+    if (valid)
+    {
+        result = build_sorted(list, keys, levels, header->count);
+    }
+
+    munmap(data, st.st_size);
+    return result;
+}
+#endif
+
+void prefill(
+    skiplist *list,
+    int prefill_count,
+    int start_range,
+    int end_range,
+    int selection_strategy,
+    int seed)
+{
     srand(seed);
     for (int j = 0; j < prefill_count; j++)
     {
@@ -310,21 +710,173 @@ struct bench_result bench(
             key = rand() % (end_range - start_range) + start_range;
             break;
         }
-        add(mylist, key, NULL);
+        add_key(list, key);
+    }
+}
+
+void prefill_or_load(
+    skiplist *list,
+    int prefill_count,
+    int start_range,
+    int end_range,
+    int selection_strategy,
+    int seed,
+    const char *prefill_from)
+{
+#ifdef STRING_KEYS
+    // Snapshots only hold integer keys
+    (void)prefill_from;
+    prefill(list, prefill_count, start_range, end_range, selection_strategy, seed);
+#else
+    if (prefill_from != NULL && load_snapshot(list, prefill_from) >= 0)
+    {
+        return;
+    }
+
+    prefill(list, prefill_count, start_range, end_range, selection_strategy, seed);
+    if (prefill_from != NULL && snapshot(list, prefill_from) < 0)
+    {
+        fprintf(stderr, "Writing snapshot to %s failed.\n", prefill_from);
+    }
+#endif
+}
+
+int bench_result_version(void)
+{
+    return BENCH_RESULT_VERSION;
+}
+
+struct bench_result bench_list(
+    skiplist *list,
+    int num_of_threads,
+    int runtime_in_sec,
+    float i,
+    float d,
+    float c,
+    int start_range,
+    int end_range,
+    int disjoint_range,
+    int selection_strategy,
+    int seed,
+    int workload,
+    struct thread_result *per_thread)
+{
+    srand(seed);
+    omp_set_num_threads(num_of_threads);
+    return run_benchmark(list, runtime_in_sec, i, d, c, start_range, end_range, selection_strategy, disjoint_range, seed, workload, per_thread);
+}
+
+struct bench_session *session_create(int basic_testing)
+{
+    struct bench_session *session = malloc(sizeof(struct bench_session));
+    skiplist *list = malloc(sizeof(skiplist));
+    if (!session || !list)
+    {
+        fprintf(stderr, "Memory allocation failed for skiplist.\n");
+        exit(EXIT_FAILURE);
+    }
+    init(list);
+    session->list = list;
+    session->basic_correctness_test_success = 0;
+
+#pragma omp single
+    {
+        if (basic_testing == 1)
+        {
+            session->basic_correctness_test_success = basic_correctness_test(list);
+        }
     }
 
+    return session;
+}
+
+double session_prefill(
+    struct bench_session *session,
+    int prefill_count,
+    int start_range,
+    int end_range,
+    int selection_strategy,
+    int seed,
+    const char *prefill_from)
+{
+    double tic = omp_get_wtime();
+    prefill_or_load(session->list, prefill_count, start_range, end_range, selection_strategy, seed, prefill_from);
+    return omp_get_wtime() - tic;
+}
+
+struct bench_result session_run_phase(
+    struct bench_session *session,
+    int num_of_threads,
+    int runtime_in_sec,
+    float i,
+    float d,
+    float c,
+    int start_range,
+    int end_range,
+    int disjoint_range,
+    int selection_strategy,
+    int seed,
+    int workload,
+    struct thread_result *per_thread)
+{
     struct bench_result result = {0};
+    // Seed every phase, such that it draws the same keys whether it runs
+    // alone or after other phases of the session
+    srand(seed);
     omp_set_num_threads(num_of_threads);
     {
 #ifdef VERBOSE
         printf("Number of threads: %d\n", omp_get_max_threads());
 #endif
-        result = run_benchmark(mylist, runtime_in_sec, i, d, c, start_range, end_range, selection_strategy, disjoint_range, seed);
-        result.basic_correctness_test_success = basic_testing_result;
+        result = run_benchmark(session->list, runtime_in_sec, i, d, c, start_range, end_range, selection_strategy, disjoint_range, seed, workload, per_thread);
+        result.basic_correctness_test_success = session->basic_correctness_test_success;
+    }
+
+    skiplist_stats list_stats;
+    stats(session->list, &list_stats);
+    result.live_keys = list_stats.live_keys;
+    result.marked_nodes = list_stats.marked_nodes;
+    for (int level = 0; level < MAX_LEVEL; level++)
+    {
+        result.nodes_per_level[level] = list_stats.nodes_per_level[level];
     }
+    result.avg_search_path_length = list_stats.avg_search_path_length;
+    result.bytes_allocated = list_stats.bytes_allocated;
+    result.size = size(session->list);
+    result.size_check_success = result.size == list_stats.live_keys;
+
+    return result;
+}
+
+void session_destroy(struct bench_session *session)
+{
+    clean(session->list);
+    free(session->list);
+    free(session);
+}
 
-    clean(mylist);
-    free(mylist);
+struct bench_result bench(
+    int num_of_threads,
+    int runtime_in_sec,
+    float i,
+    float d,
+    float c,
+    int start_range,
+    int end_range,
+    int disjoint_range,
+    int selection_strategy,
+    int prefill_count,
+    int basic_testing,
+    int seed,
+    const char *prefill_from,
+    int workload,
+    struct thread_result *per_thread)
+{
+    struct bench_session *session = session_create(basic_testing);
+    double prefill_time = session_prefill(session, prefill_count, start_range, end_range, selection_strategy, seed, prefill_from);
+    struct bench_result result = session_run_phase(session, num_of_threads, runtime_in_sec, i, d, c, start_range, end_range, disjoint_range, selection_strategy, seed, workload, per_thread);
+    result.prefill_time = prefill_time;
+    session_destroy(session);
 
 #ifdef VERBOSE
     printf("\nTime: %f seconds\n", result.time);
@@ -336,10 +888,17 @@ struct bench_result bench(
            result.successful_contains, result.total_contains);
     printf("Total operations: %llu\n", result.total_operations);
 
-    for (int i = 0; i < num_of_threads; i++)
+    for (int i = 0; per_thread != NULL && i < result.threads; i++)
     {
-        printf("Thread %d: %llu operations\n", i, result.operations_per_thread[i]);
+        printf("Thread %d: %llu operations\n", i, per_thread[i].operations);
     }
+
+    printf("Live keys: %lld, marked nodes: %lld\n", result.live_keys, result.marked_nodes);
+    printf("Average search path length: %f\n", result.avg_search_path_length);
+    printf("Bytes allocated: %lld\n", result.bytes_allocated);
+    printf("Prefill time: %f seconds\n", result.prefill_time);
+    printf("Size: %lld (%s the level 0 walk)\n", result.size, result.size_check_success ? "matches" : "DIFFERS from");
+    printf("Size update: %f ns, %f%% of the run time\n", result.size_update_ns, 100 * result.size_overhead);
 #endif
 
     return result;
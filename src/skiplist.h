@@ -6,7 +6,8 @@
  * @brief This file defines the necessary structs and methods for the skiplist.
  *  Different implementations of the skiplist are controlled via #define statements,
  *  which are specified in the corresponding implementation files and activated through
- *  the linking process during compilation.
+ *  the linking process during compilation. Variants that change the layout of the
+ *  skiplist struct itself are also passed to library.c by the Makefile.
  */
 
 #include <stdio.h>
@@ -15,12 +16,34 @@
 #include <limits.h>
 #include <omp.h>
 
+#ifdef BACKGROUND_INDEX
+#include <pthread.h>
+#endif
+
 #define MAX_LEVEL 16
 #define P 0.5
+#define STATS_PROBES 1024
+#define SIZE_COUNTERS 64
+#define SIZE_BATCH 64
+#define SIZE_PUBLISHED SIZE_COUNTERS
+
+#ifdef STRING_KEYS
+/**
+ * @brief Orders two byte-string keys, returning a negative value, zero or a
+ *  positive value if the first key is smaller, equal or larger than the second.
+ */
+typedef int (*key_comparator)(const unsigned char *a, size_t a_length, const unsigned char *b, size_t b_length);
+#endif
 
 typedef struct _node
 {
+#ifdef STRING_KEYS
+    unsigned long prefix;
+    size_t length;
+    unsigned char *key;
+#else
     long key;
+#endif
     void *value;
     int top_level;
 
@@ -31,20 +54,79 @@ typedef struct _node
     struct _node *next[MAX_LEVEL];
 #elif defined(LOCK_FREE)
     _Atomic(struct _node *) next[MAX_LEVEL];
+#elif defined(SHARED_MEMORY)
+    _Atomic long next[MAX_LEVEL];
 #else
     struct _node *next[MAX_LEVEL];
 #endif
 } skiplist_node;
 
+/**
+ * @brief Number of keys added to and removed from a list by the threads
+ *  sharing one slot. The concurrent variants also count the memory of the
+ *  nodes these threads allocated here. Every slot has its own cache line,
+ *  such that threads counting their updates never write to the same line.
+ *  Their slots publish the number of keys they hold whenever it moved by
+ *  SIZE_BATCH since the last time, and the published field of the extra
+ *  slot at SIZE_PUBLISHED sums the published fields of all others. In
+ *  shared memory a slot also keeps the offset of a node that an insert
+ *  allocated but did not link, for the next insert of its threads.
+ */
+typedef struct _size_counter
+{
+    _Atomic long long added;
+    _Atomic long long removed;
+    _Atomic long long published;
+    _Atomic long long bytes_allocated;
+#ifdef STRING_KEYS
+    _Atomic long long nodes_allocated;
+#endif
+#ifdef SHARED_MEMORY
+    _Atomic long spare;
+#endif
+} __attribute__((aligned(64))) size_counter;
+
 typedef struct _list
 {
     struct _node *header;
+    size_counter *counters;
+
+#if defined(SHARED_MEMORY)
+    struct _segment *segment;
+#elif !defined(FINE_LOCKING) && !defined(LOCK_FREE)
+    long long bytes_allocated;
+#endif
 
 #ifdef GLOBAL_LOCK
     omp_lock_t lock;
 #endif
+
+#ifdef BACKGROUND_INDEX
+    pthread_t maintainer;
+    atomic_int running;
+#endif
+
+#ifdef FLAT_COMBINING
+    atomic_int combining;
+    atomic_int slots_used;
+    long id;
+    struct _fc_slot *slots;
+#endif
+
+#ifdef STRING_KEYS
+    key_comparator compare;
+#endif
 } skiplist;
 
+typedef struct _stats
+{
+    long long live_keys;
+    long long marked_nodes;
+    long long nodes_per_level[MAX_LEVEL];
+    double avg_search_path_length;
+    long long bytes_allocated;
+} skiplist_stats;
+
 /**
  * @brief Initializes a skiplist structure.
  *
@@ -59,6 +141,102 @@ void init(skiplist *list);
  */
 void clean(skiplist *list);
 
+#ifdef STRING_KEYS
+/**
+ * @brief Inserts a byte-string key with its value into the skiplist. The key
+ *  bytes are copied into the node.
+ *
+ * @param list Pointer to the skiplist.
+ * @param key The key bytes to insert.
+ * @param length Length of the key in bytes.
+ * @param value Pointer to the value associated with the key.
+ *
+ * @return 1 if the insertion was successful, 0 if the key already exists.
+ */
+int add(skiplist *list, const unsigned char *key, size_t length, void *value);
+
+/**
+ * @brief Removes a byte-string key from the skiplist.
+ *
+ * @param list Pointer to the skiplist.
+ * @param key The key bytes to remove.
+ * @param length Length of the key in bytes.
+ *
+ * @return 1 if the removal was successful, 0 if the key was not found.
+ */
+int rem(skiplist *list, const unsigned char *key, size_t length);
+
+/**
+ * @brief Checks if a byte-string key exists in the skiplist.
+ *
+ * @param list Pointer to the skiplist.
+ * @param key The key bytes to check.
+ * @param length Length of the key in bytes.
+ *
+ * @return 1 if the key is found, 0 otherwise.
+ */
+int con(skiplist *list, const unsigned char *key, size_t length);
+
+/**
+ * @brief Inserts a batch of byte-string keys, see the integer variant.
+ *
+ * @param list Pointer to the skiplist.
+ * @param keys The key bytes of every key, in ascending order.
+ * @param lengths Length of every key in bytes.
+ * @param n Number of keys.
+ *
+ * @return The number of keys inserted.
+ */
+long add_sorted_batch(skiplist *list, const unsigned char *const *keys, const size_t *lengths, long n);
+
+/**
+ * @brief Removes all byte-string keys in [lo, hi), see the integer variant.
+ *
+ * @param list Pointer to the skiplist.
+ * @param lo The smallest key to remove.
+ * @param lo_length Length of lo in bytes.
+ * @param hi The first key above the range.
+ * @param hi_length Length of hi in bytes.
+ *
+ * @return The number of keys removed.
+ */
+long rem_range(skiplist *list, const unsigned char *lo, size_t lo_length, const unsigned char *hi, size_t hi_length);
+
+/**
+ * @brief Replaces the default bytewise ordering of the keys. Must be set while
+ *  the list is still empty. With a custom comparator the inlined prefixes
+ *  cannot be used to order keys, so every comparison calls the comparator.
+ *
+ * @param list Pointer to the skiplist.
+ * @param compare The comparator, NULL restores the bytewise ordering.
+ */
+void set_comparator(skiplist *list, key_comparator compare);
+
+/**
+ * @brief Removes the smallest key from the skiplist and copies it out.
+ *
+ * @param list Pointer to the skiplist.
+ * @param key Buffer receiving the key bytes, truncated to capacity.
+ * @param capacity Size of the key buffer in bytes.
+ * @param length Receives the full length of the removed key.
+ *
+ * @return 1 if a key was removed, 0 if the skiplist was empty.
+ */
+int delete_min(skiplist *list, unsigned char *key, size_t capacity, size_t *length);
+
+/**
+ * @brief Relaxed delete_min, see the integer variant.
+ *
+ * @param list Pointer to the skiplist.
+ * @param threads Number of threads popping concurrently.
+ * @param key Buffer receiving the key bytes, truncated to capacity.
+ * @param capacity Size of the key buffer in bytes.
+ * @param length Receives the full length of the removed key.
+ *
+ * @return 1 if a key was removed, 0 if the skiplist was empty.
+ */
+int spray_pop(skiplist *list, int threads, unsigned char *key, size_t capacity, size_t *length);
+#else
 /**
  * @brief Inserts a key-value pair into the skiplist.
  *
@@ -88,4 +266,128 @@ int rem(skiplist *list, long key);
  *
  * @return 1 if the key is found, 0 otherwise.
  */
-int con(skiplist *list, long key);
\ No newline at end of file
+int con(skiplist *list, long key);
+
+/**
+ * @brief Inserts a batch of keys with NULL values. Each key is searched for
+ *  starting from the predecessors of the previous one, so for ascending keys
+ *  only the gap between consecutive keys is walked. Keys that are not in
+ *  ascending order restart the search from the header, present keys are skipped.
+ *
+ * @param list Pointer to the skiplist.
+ * @param keys The keys to insert, in ascending order.
+ * @param n Number of keys.
+ *
+ * @return The number of keys inserted.
+ */
+long add_sorted_batch(skiplist *list, const long *keys, long n);
+
+/**
+ * @brief Removes all keys in [lo, hi). The predecessors of lo are searched for
+ *  once and the run behind them is unlinked without further searches. The
+ *  removal is not atomic, keys inserted concurrently into the range may remain.
+ *
+ * @param list Pointer to the skiplist.
+ * @param lo The smallest key to remove.
+ * @param hi The first key above the range.
+ *
+ * @return The number of keys removed.
+ */
+long rem_range(skiplist *list, long lo, long hi);
+
+/**
+ * @brief Removes the smallest key from the skiplist.
+ *
+ * @param list Pointer to the skiplist.
+ * @param key Receives the removed key.
+ *
+ * @return 1 if a key was removed, 0 if the skiplist was empty.
+ */
+int delete_min(skiplist *list, long *key);
+
+/**
+ * @brief Relaxed delete_min in the style of the SprayList. Instead of all
+ *  threads competing for the first node, every pop removes a random one of
+ *  roughly the first threads * log^3(threads) keys. Only the lock-free
+ *  variants spray, the others and a single thread take the exact minimum.
+ *
+ * @param list Pointer to the skiplist.
+ * @param threads Number of threads popping concurrently.
+ * @param key Receives the removed key.
+ *
+ * @return 1 if a key was removed, 0 if the skiplist was empty.
+ */
+int spray_pop(skiplist *list, int threads, long *key);
+#endif
+
+/**
+ * @brief Counts keys added to and removed from the skiplist in the size
+ *  counter slot of the calling thread. Called by the operations themselves,
+ *  and exported such that the benchmark driver can measure its cost.
+ *
+ * @param list Pointer to the skiplist.
+ * @param added Number of keys added.
+ * @param removed Number of keys removed.
+ */
+void update_size(skiplist *list, long long added, long long removed);
+
+/**
+ * @brief Returns the number of keys in the skiplist by summing the size
+ *  counters of all threads, without walking the list. Exact while no other
+ *  operation is running on the list.
+ *
+ * @param list Pointer to the skiplist.
+ *
+ * @return The number of keys.
+ */
+long long size(skiplist *list);
+
+/**
+ * @brief Returns the number of keys in the skiplist while other operations
+ *  may be running, reading a single counter. In the concurrent variants it
+ *  lags behind size() by less than SIZE_BATCH keys for every thread that
+ *  updated the list, the others return the exact count.
+ *
+ * @param list Pointer to the skiplist.
+ *
+ * @return The approximate number of keys, never negative.
+ */
+long long approximate_size(skiplist *list);
+
+/**
+ * @brief Collects structural statistics of the skiplist. Must only be called
+ *  while no other operation is running on the list.
+ *
+ *  The search path length is averaged over up to STATS_PROBES keys sampled
+ *  evenly from level 0 and counts every node inspected on the way down.
+ *  Marked nodes are logically deleted nodes whose memory is not yet freed.
+ *
+ * @param list Pointer to the skiplist.
+ * @param out Pointer to the statistics structure to fill.
+ */
+void stats(skiplist *list, skiplist_stats *out);
+
+#ifndef STRING_KEYS
+/**
+ * @brief Visits every present key on level 0 in ascending order. Used to take
+ *  snapshots, so it must only be called while the list is quiescent.
+ *
+ * @param list Pointer to the skiplist.
+ * @param visit Callback receiving the key, the top level of its tower and arg.
+ * @param arg Opaque pointer passed through to the callback.
+ */
+void for_each(skiplist *list, void (*visit)(long key, int top_level, void *arg), void *arg);
+
+/**
+ * @brief Builds an empty skiplist from strictly ascending keys and their tower
+ *  heights in a single linear pass, without any searching.
+ *
+ * @param list Pointer to the empty skiplist.
+ * @param keys Strictly ascending keys.
+ * @param levels Top level of the tower of every key, below MAX_LEVEL.
+ * @param count Number of keys.
+ *
+ * @return The number of keys inserted.
+ */
+long build_sorted(skiplist *list, const long *keys, const unsigned char *levels, long count);
+#endif
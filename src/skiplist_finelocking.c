@@ -9,6 +9,26 @@
 #include "skiplist_finelocking.h"
 #include "skiplist.h"
 
+// Size counter slot of the calling thread, the same in every list
+static atomic_int next_counter_slot = 0;
+static _Thread_local int counter_slot = -1;
+
+static size_counter *own_counter(skiplist *list)
+{
+    if (counter_slot < 0)
+    {
+        counter_slot = atomic_fetch_add_explicit(&next_counter_slot, 1, memory_order_relaxed) % SIZE_COUNTERS;
+    }
+    return &list->counters[counter_slot];
+}
+
+// Nodes are counted in the slot of the allocating thread to keep inserts off a shared cache line
+static void count_allocation(skiplist *list, long long bytes)
+{
+    size_counter *counter = own_counter(list);
+    atomic_fetch_add_explicit(&counter->bytes_allocated, bytes, memory_order_relaxed);
+}
+
 void init(skiplist *list)
 {
     list->header = (skiplist_node *)malloc(sizeof(skiplist_node));
@@ -23,6 +43,20 @@ void init(skiplist *list)
     {
         list->header->next[i] = NULL;
     }
+
+    list->counters = aligned_alloc(sizeof(size_counter), (SIZE_COUNTERS + 1) * sizeof(size_counter));
+    if (!list->counters)
+    {
+        fprintf(stderr, "Memory allocation failed for size counters.\n");
+        exit(EXIT_FAILURE);
+    }
+    for (int i = 0; i < SIZE_COUNTERS + 1; i++)
+    {
+        atomic_init(&list->counters[i].added, 0);
+        atomic_init(&list->counters[i].removed, 0);
+        atomic_init(&list->counters[i].published, 0);
+        atomic_init(&list->counters[i].bytes_allocated, 0);
+    }
 }
 
 void clean(skiplist *list)
@@ -43,10 +77,13 @@ void clean(skiplist *list)
         }
     }
 
+    free(list->counters);
     list->header = NULL;
+    list->counters = NULL;
 }
 
 int find(skiplist *list, long key, skiplist_node **preds, skiplist_node **succs);
+int find_from(skiplist *list, long key, skiplist_node **preds, skiplist_node **succs);
 
 int randomLevel(double p, int max_level)
 {
@@ -80,15 +117,41 @@ int find(skiplist *list, long key, skiplist_node **preds, skiplist_node **succs)
     return lFound;
 }
 
-int add(skiplist *list, long key, void *value)
+int find_from(skiplist *list, long key, skiplist_node **preds, skiplist_node **succs)
+{
+    // preds hold the predecessors of a smaller key, which are reused as a
+    // finger unless they were removed in the meantime
+    int lFound = -1;
+    skiplist_node *pred = list->header;
+    for (int level = MAX_LEVEL - 1; level >= 0; level--)
+    {
+        if (preds[level]->key > pred->key && preds[level]->marked == 0)
+        {
+            pred = preds[level];
+        }
+        skiplist_node *curr = pred->next[level];
+        while (curr != NULL && curr->key < key)
+        {
+            pred = curr;
+            curr = pred->next[level];
+        }
+        if (lFound == -1 && curr != NULL && curr->key == key)
+        {
+            lFound = level;
+        }
+        preds[level] = pred;
+        succs[level] = curr;
+    }
+    return lFound;
+}
+
+int add_from(skiplist *list, long key, void *value, skiplist_node **preds, skiplist_node **succs)
 {
     int topLevel = randomLevel(P, MAX_LEVEL - 1);
-    skiplist_node *preds[MAX_LEVEL];
-    skiplist_node *succs[MAX_LEVEL];
 
     while (1)
     {
-        int lFound = find(list, key, preds, succs);
+        int lFound = find_from(list, key, preds, succs);
         if (lFound != -1)
         {
             skiplist_node *nodeFound = succs[lFound];
@@ -147,6 +210,7 @@ int add(skiplist *list, long key, void *value)
         new_node->marked = 0;
         new_node->fullyLinked = 0;
         new_node->top_level = topLevel;
+        count_allocation(list, sizeof(skiplist_node));
         omp_init_lock(&new_node->lock);
         for (int i = 0; i < MAX_LEVEL; i++)
         {
@@ -166,10 +230,50 @@ int add(skiplist *list, long key, void *value)
             omp_unset_lock(&nodesToLock[i]->lock);
         }
 
+        update_size(list, 1, 0);
         return 1;
     }
 }
 
+int add(skiplist *list, long key, void *value)
+{
+    skiplist_node *preds[MAX_LEVEL];
+    skiplist_node *succs[MAX_LEVEL];
+    for (int level = 0; level < MAX_LEVEL; level++)
+    {
+        preds[level] = list->header;
+    }
+    return add_from(list, key, value, preds, succs);
+}
+
+long add_sorted_batch(skiplist *list, const long *keys, long n)
+{
+    skiplist_node *preds[MAX_LEVEL];
+    skiplist_node *succs[MAX_LEVEL];
+    for (int level = 0; level < MAX_LEVEL; level++)
+    {
+        preds[level] = list->header;
+    }
+
+    long inserted = 0;
+    for (long j = 0; j < n; j++)
+    {
+        if (j > 0 && keys[j] <= keys[j - 1])
+        {
+            // Not ascending, the finger is no longer in front of the key
+            for (int level = 0; level < MAX_LEVEL; level++)
+            {
+                preds[level] = list->header;
+            }
+        }
+        if (add_from(list, keys[j], NULL, preds, succs) == 1)
+        {
+            inserted++;
+        }
+    }
+    return inserted;
+}
+
 int con(skiplist *list, long key)
 {
     skiplist_node *node = list->header;
@@ -260,8 +364,269 @@ int rem(skiplist *list, long key)
             }
             omp_unset_lock(&victim->lock);
 
+            update_size(list, 0, 1);
             return 1;
         }
         return 0;
     }
+}
+
+long rem_range(skiplist *list, long lo, long hi)
+{
+    skiplist_node *preds[MAX_LEVEL];
+    skiplist_node *succs[MAX_LEVEL];
+    long removed = 0;
+
+    find(list, lo, preds, succs);
+    while (1)
+    {
+        // Once the victims in front are unlinked, the next one directly
+        // follows the same predecessors, so no search is needed per key
+        skiplist_node *victim = preds[0]->next[0];
+        if (preds[0]->marked == 1 || (victim != NULL && victim->key < lo))
+        {
+            // The predecessor was removed or a key below the range was
+            // inserted behind it
+            find(list, lo, preds, succs);
+            continue;
+        }
+        if (victim == NULL || victim->key >= hi)
+        {
+            update_size(list, 0, removed);
+            return removed;
+        }
+
+        // As in rem, the victim is locked before its predecessors, which
+        // are then validated to be unmarked and still pointing to it
+        omp_set_lock(&victim->lock);
+        if (victim->marked == 1 || victim->fullyLinked == 0)
+        {
+            // Another thread is still removing or inserting it
+            omp_unset_lock(&victim->lock);
+            find(list, lo, preds, succs);
+            continue;
+        }
+        victim->marked = 1;
+        int topLevel = victim->top_level;
+
+        while (1)
+        {
+            skiplist_node *nodesToLock[MAX_LEVEL];
+            int numNodesToLock = 0;
+            nodesToLock[numNodesToLock++] = preds[0];
+            for (int level = 1; level <= topLevel; level++)
+            {
+                if (preds[level]->key != preds[level - 1]->key)
+                {
+                    nodesToLock[numNodesToLock++] = preds[level];
+                }
+            }
+            for (int i = 0; i < numNodesToLock; i++)
+            {
+                omp_set_lock(&nodesToLock[i]->lock);
+            }
+
+            int valid = 1;
+            for (int level = 0; level <= topLevel && valid; level++)
+            {
+                valid = preds[level]->marked == 0 && preds[level]->next[level] == victim;
+            }
+
+            if (valid)
+            {
+                for (int level = 0; level <= topLevel; level++)
+                {
+                    preds[level]->next[level] = victim->next[level];
+                }
+            }
+
+            for (int i = 0; i < numNodesToLock; i++)
+            {
+                omp_unset_lock(&nodesToLock[i]->lock);
+            }
+            if (valid)
+            {
+                break;
+            }
+            find(list, victim->key, preds, succs);
+        }
+
+        omp_unset_lock(&victim->lock);
+        removed++;
+    }
+}
+
+int delete_min(skiplist *list, long *key)
+{
+    skiplist_node *node = list->header->next[0];
+    while (node != NULL)
+    {
+        // Nodes are not freed on removal, so a node taken by another thread
+        // still leads on to the remaining ones
+        if (node->fullyLinked == 1 && node->marked == 0 && rem(list, node->key))
+        {
+            *key = node->key;
+            return 1;
+        }
+        node = node->next[0];
+    }
+    return 0;
+}
+
+int spray_pop(skiplist *list, int threads, long *key)
+{
+    // Only the lock-free variants spray, this one takes the exact minimum
+    (void)threads;
+    return delete_min(list, key);
+}
+
+void update_size(skiplist *list, long long added, long long removed)
+{
+    size_counter *counter = own_counter(list);
+    if (added)
+        atomic_fetch_add_explicit(&counter->added, added, memory_order_relaxed);
+    if (removed)
+        atomic_fetch_add_explicit(&counter->removed, removed, memory_order_relaxed);
+
+    // Publish the keys of the slot once they moved by SIZE_BATCH, the CAS makes
+    // sure that threads sharing the slot publish every change only once
+    long long keys = atomic_load_explicit(&counter->added, memory_order_relaxed) - atomic_load_explicit(&counter->removed, memory_order_relaxed);
+    long long published = atomic_load_explicit(&counter->published, memory_order_relaxed);
+    if ((keys - published >= SIZE_BATCH || published - keys >= SIZE_BATCH) &&
+        atomic_compare_exchange_strong_explicit(&counter->published, &published, keys, memory_order_relaxed, memory_order_relaxed))
+    {
+        atomic_fetch_add_explicit(&list->counters[SIZE_PUBLISHED].published, keys - published, memory_order_relaxed);
+    }
+}
+
+long long size(skiplist *list)
+{
+    long long keys = 0;
+    for (int i = 0; i < SIZE_COUNTERS; i++)
+    {
+        keys += atomic_load(&list->counters[i].added) - atomic_load(&list->counters[i].removed);
+    }
+    return keys;
+}
+
+long long approximate_size(skiplist *list)
+{
+    long long keys = atomic_load_explicit(&list->counters[SIZE_PUBLISHED].published, memory_order_relaxed);
+    return keys > 0 ? keys : 0;
+}
+
+int search_path_length(skiplist *list, long key)
+{
+    int length = 0;
+    skiplist_node *node = list->header;
+    for (int i = MAX_LEVEL - 1; i >= 0; i--)
+    {
+        while (node->next[i] != NULL)
+        {
+            length++;
+            if (node->next[i]->key >= key)
+            {
+                break;
+            }
+            node = node->next[i];
+        }
+    }
+
+    return length;
+}
+
+void stats(skiplist *list, skiplist_stats *out)
+{
+    *out = (skiplist_stats){0};
+    for (skiplist_node *node = list->header->next[0]; node != NULL; node = node->next[0])
+    {
+        if (node->marked == 1 || node->fullyLinked == 0)
+        {
+            continue;
+        }
+
+        out->live_keys++;
+        for (int i = 0; i <= node->top_level; i++)
+        {
+            out->nodes_per_level[i]++;
+        }
+    }
+
+    long long step = (out->live_keys + STATS_PROBES - 1) / STATS_PROBES;
+    long long index = 0, probes = 0, total_length = 0;
+    for (skiplist_node *node = list->header->next[0]; node != NULL; node = node->next[0])
+    {
+        if (node->marked == 1 || node->fullyLinked == 0)
+        {
+            continue;
+        }
+
+        if (index++ % step == 0)
+        {
+            total_length += search_path_length(list, node->key);
+            probes++;
+        }
+    }
+
+    out->avg_search_path_length = probes > 0 ? (double)total_length / probes : 0.0;
+    out->bytes_allocated = sizeof(skiplist_node);
+    for (int i = 0; i < SIZE_COUNTERS; i++)
+    {
+        out->bytes_allocated += atomic_load_explicit(&list->counters[i].bytes_allocated, memory_order_relaxed);
+    }
+    out->marked_nodes = out->bytes_allocated / sizeof(skiplist_node) - 1 - out->live_keys;
+}
+
+void for_each(skiplist *list, void (*visit)(long key, int top_level, void *arg), void *arg)
+{
+    for (skiplist_node *node = list->header->next[0]; node != NULL; node = node->next[0])
+    {
+        if (node->marked == 0 && node->fullyLinked == 1)
+        {
+            visit(node->key, node->top_level, arg);
+        }
+    }
+}
+
+long build_sorted(skiplist *list, const long *keys, const unsigned char *levels, long count)
+{
+    skiplist_node *last[MAX_LEVEL];
+    for (int i = 0; i < MAX_LEVEL; i++)
+    {
+        last[i] = list->header;
+    }
+
+    long inserted = 0;
+    for (; inserted < count; inserted++)
+    {
+        skiplist_node *new_node = (skiplist_node *)malloc(sizeof(skiplist_node));
+        if (!new_node)
+        {
+            break;
+        }
+        new_node->key = keys[inserted];
+        new_node->value = NULL;
+        new_node->marked = 0;
+        new_node->fullyLinked = 1;
+        new_node->top_level = levels[inserted];
+        omp_init_lock(&new_node->lock);
+
+        for (int level = 0; level < MAX_LEVEL; level++)
+        {
+            new_node->next[level] = NULL;
+        }
+        for (int level = 0; level <= new_node->top_level; level++)
+        {
+            last[level]->next[level] = new_node;
+            last[level] = new_node;
+        }
+    }
+
+    for (int level = 0; level < MAX_LEVEL; level++)
+    {
+        last[level]->next[level] = NULL;
+    }
+    count_allocation(list, inserted * (long long)sizeof(skiplist_node));
+    update_size(list, inserted, 0);
+    return inserted;
 }
\ No newline at end of file
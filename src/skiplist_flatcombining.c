@@ -0,0 +1,527 @@
+/**
+ * @file skiplist_flatcombining.c
+ * @author Natalia Tylek (12332258), Marlene Riegel (01620782), Maximilian Kleinegger (12041500)
+ * @date 2025-01-13
+ *
+ * @brief This file implements the skiplist using flat combining. Instead of every
+ *  operation acquiring the global lock, threads publish their requests in per-thread
+ *  slots. Whichever thread acquires the lock becomes the combiner, sorts all pending
+ *  requests by key and executes them in a single pass over the sequential skiplist,
+ *  reusing the search path between neighbouring keys. Operations that are not
+ *  combined simply hold the lock, as in the global locking variant.
+ */
+
+#include "skiplist_flatcombining.h"
+#include "skiplist.h"
+
+// Every list gets a unique id, such that the slot a thread cached for a
+// freed list is never mistaken for one of a new list at the same address
+static atomic_long next_list_id = 1;
+static _Thread_local long cached_list_id = 0;
+static _Thread_local fc_slot *cached_slot = NULL;
+
+void init(skiplist *list)
+{
+    list->header = malloc(sizeof(skiplist_node));
+    list->header->key = INT_MIN;
+    list->header->value = NULL;
+    list->header->top_level = MAX_LEVEL - 1;
+    list->bytes_allocated = sizeof(skiplist_node);
+
+    list->counters = aligned_alloc(sizeof(size_counter), SIZE_COUNTERS * sizeof(size_counter));
+    if (!list->counters)
+    {
+        fprintf(stderr, "Memory allocation failed for size counters.\n");
+        exit(EXIT_FAILURE);
+    }
+    for (int i = 0; i < SIZE_COUNTERS; i++)
+    {
+        atomic_init(&list->counters[i].added, 0);
+        atomic_init(&list->counters[i].removed, 0);
+    }
+
+    for (int i = 0; i < MAX_LEVEL; i++)
+    {
+        list->header->next[i] = NULL;
+    }
+
+    list->slots = aligned_alloc(sizeof(fc_slot), FC_SLOTS * sizeof(fc_slot));
+    if (!list->slots)
+    {
+        fprintf(stderr, "Memory allocation failed for publication slots.\n");
+        exit(EXIT_FAILURE);
+    }
+    for (int i = 0; i < FC_SLOTS; i++)
+    {
+        atomic_init(&list->slots[i].pending, 0);
+    }
+    atomic_init(&list->slots_used, 0);
+    atomic_init(&list->combining, 0);
+    list->id = FAA(&next_list_id, 1);
+}
+
+void clean(skiplist *list)
+{
+    skiplist_node *node = list->header->next[0];
+    while (node != NULL)
+    {
+        skiplist_node *next = node->next[0];
+        free(node);
+        node = next;
+    }
+
+    free(list->slots);
+    free(list->counters);
+    free(list->header);
+}
+
+int randomLevel(double p, int max_level)
+{
+    int level = 0;
+
+    while ((rand() / (double)RAND_MAX) < p && level < max_level - 1)
+    {
+        level++;
+    }
+
+    return level;
+}
+
+void lock_list(skiplist *list)
+{
+    int spins = 0;
+    while (1)
+    {
+        int expected = 0;
+        if (LOAD(&list->combining) == 0 && CAS(&list->combining, &expected, 1))
+        {
+            return;
+        }
+        if (++spins == FC_SPINS)
+        {
+            spins = 0;
+            sched_yield();
+        }
+    }
+}
+
+void unlock_list(skiplist *list)
+{
+    STORE(&list->combining, 0);
+}
+
+fc_slot *own_slot(skiplist *list)
+{
+    if (cached_list_id != list->id)
+    {
+        int index = FAA(&list->slots_used, 1);
+        cached_slot = index < FC_SLOTS ? &list->slots[index] : NULL;
+        cached_list_id = list->id;
+    }
+    return cached_slot;
+}
+
+void find_from(skiplist *list, long key, skiplist_node **update)
+{
+    // update holds the predecessors of a smaller key, which are reused as a
+    // finger, such that only the gap to the previous key is walked
+    skiplist_node *node = list->header;
+    for (int i = MAX_LEVEL - 1; i >= 0; i--)
+    {
+        if (update[i]->key > node->key)
+        {
+            node = update[i];
+        }
+        while (node->next[i] != NULL && node->next[i]->key < key)
+        {
+            node = node->next[i];
+        }
+        update[i] = node;
+    }
+}
+
+int apply(skiplist *list, skiplist_node **update, int op, long key, void *value)
+{
+    find_from(list, key, update);
+    skiplist_node *node = update[0]->next[0];
+    int found = node != NULL && node->key == key;
+
+    if (op == FC_CON)
+    {
+        return found;
+    }
+
+    if (op == FC_ADD)
+    {
+        if (found)
+        {
+            return 0;
+        }
+
+        int topLevel = randomLevel(P, MAX_LEVEL);
+        skiplist_node *new_node = malloc(sizeof(skiplist_node));
+        new_node->key = key;
+        new_node->value = value;
+        new_node->top_level = topLevel;
+        list->bytes_allocated += sizeof(skiplist_node);
+        update_size(list, 1, 0);
+
+        for (int i = 0; i <= topLevel; i++)
+        {
+            new_node->next[i] = update[i]->next[i];
+            update[i]->next[i] = new_node;
+        }
+        return 1;
+    }
+
+    if (!found)
+    {
+        return 0;
+    }
+
+    for (int i = 0; i <= node->top_level; i++)
+    {
+        if (update[i]->next[i] != node)
+        {
+            break;
+        }
+        update[i]->next[i] = node->next[i];
+    }
+
+    free(node);
+    list->bytes_allocated -= sizeof(skiplist_node);
+    update_size(list, 0, 1);
+    return 1;
+}
+
+void combine(skiplist *list)
+{
+    int used = LOAD(&list->slots_used);
+    int count = used < FC_SLOTS ? used : FC_SLOTS;
+    fc_slot *batch[FC_SLOTS];
+    int size = 0;
+
+    // Collect the pending requests, sorted by key with an insertion sort, as
+    // there are at most as many as threads
+    for (int i = 0; i < count; i++)
+    {
+        fc_slot *slot = &list->slots[i];
+        if (!LOAD(&slot->pending))
+        {
+            continue;
+        }
+
+        int j = size++;
+        while (j > 0 && batch[j - 1]->key > slot->key)
+        {
+            batch[j] = batch[j - 1];
+            j--;
+        }
+        batch[j] = slot;
+    }
+
+    skiplist_node *update[MAX_LEVEL];
+    for (int i = 0; i < MAX_LEVEL; i++)
+    {
+        update[i] = list->header;
+    }
+
+    for (int i = 0; i < size; i++)
+    {
+        batch[i]->result = apply(list, update, batch[i]->op, batch[i]->key, batch[i]->value);
+        STORE(&batch[i]->pending, 0);
+    }
+}
+
+int execute(skiplist *list, int op, long key, void *value)
+{
+    fc_slot *slot = own_slot(list);
+    if (!slot)
+    {
+        // No slot left, so this thread operates under the lock directly
+        skiplist_node *update[MAX_LEVEL];
+        for (int i = 0; i < MAX_LEVEL; i++)
+        {
+            update[i] = list->header;
+        }
+        lock_list(list);
+        int result = apply(list, update, op, key, value);
+        unlock_list(list);
+        return result;
+    }
+
+    slot->op = op;
+    slot->key = key;
+    slot->value = value;
+    STORE(&slot->pending, 1);
+
+    int spins = 0;
+    while (LOAD(&slot->pending))
+    {
+        int expected = 0;
+        if (LOAD(&list->combining) == 0 && CAS(&list->combining, &expected, 1))
+        {
+            combine(list);
+            unlock_list(list);
+        }
+        else if (++spins == FC_SPINS)
+        {
+            spins = 0;
+            sched_yield();
+        }
+    }
+    return slot->result;
+}
+
+int add(skiplist *list, long key, void *value)
+{
+    return execute(list, FC_ADD, key, value);
+}
+
+int rem(skiplist *list, long key)
+{
+    return execute(list, FC_REM, key, NULL);
+}
+
+int con(skiplist *list, long key)
+{
+    return execute(list, FC_CON, key, NULL);
+}
+
+int delete_min(skiplist *list, long *key)
+{
+    lock_list(list);
+    skiplist_node *node = list->header->next[0];
+    if (node == NULL)
+    {
+        unlock_list(list);
+        return 0;
+    }
+
+    // The minimum is the first node on every level of its tower
+    for (int i = 0; i <= node->top_level; i++)
+    {
+        list->header->next[i] = node->next[i];
+    }
+
+    *key = node->key;
+    free(node);
+    list->bytes_allocated -= sizeof(skiplist_node);
+    update_size(list, 0, 1);
+    unlock_list(list);
+    return 1;
+}
+
+int spray_pop(skiplist *list, int threads, long *key)
+{
+    // Pops are serialized by the lock anyway, so the exact minimum is taken
+    (void)threads;
+    return delete_min(list, key);
+}
+
+long add_sorted_batch(skiplist *list, const long *keys, long n)
+{
+    lock_list(list);
+    skiplist_node *update[MAX_LEVEL];
+    for (int i = 0; i < MAX_LEVEL; i++)
+    {
+        update[i] = list->header;
+    }
+
+    long inserted = 0;
+    for (long j = 0; j < n; j++)
+    {
+        if (j > 0 && keys[j] <= keys[j - 1])
+        {
+            // Not ascending, the finger is no longer in front of the key
+            for (int i = 0; i < MAX_LEVEL; i++)
+            {
+                update[i] = list->header;
+            }
+        }
+
+        find_from(list, keys[j], update);
+        if (update[0]->next[0] != NULL && update[0]->next[0]->key == keys[j])
+        {
+            continue;
+        }
+
+        int topLevel = randomLevel(P, MAX_LEVEL);
+        skiplist_node *new_node = malloc(sizeof(skiplist_node));
+        new_node->key = keys[j];
+        new_node->value = NULL;
+        new_node->top_level = topLevel;
+        list->bytes_allocated += sizeof(skiplist_node);
+        update_size(list, 1, 0);
+
+        for (int i = 0; i <= topLevel; i++)
+        {
+            new_node->next[i] = update[i]->next[i];
+            update[i]->next[i] = new_node;
+        }
+        inserted++;
+    }
+
+    unlock_list(list);
+    return inserted;
+}
+
+long rem_range(skiplist *list, long lo, long hi)
+{
+    lock_list(list);
+    skiplist_node *update[MAX_LEVEL];
+    skiplist_node *node = list->header;
+    for (int i = MAX_LEVEL - 1; i >= 0; i--)
+    {
+        while (node->next[i] != NULL && node->next[i]->key < lo)
+        {
+            node = node->next[i];
+        }
+        update[i] = node;
+    }
+
+    // All nodes in front of the current one are removed already, so it
+    // directly follows the predecessors of lo on every level of its tower
+    long removed = 0;
+    node = node->next[0];
+    while (node != NULL && node->key < hi)
+    {
+        skiplist_node *next = node->next[0];
+        for (int i = 0; i <= node->top_level; i++)
+        {
+            update[i]->next[i] = node->next[i];
+        }
+
+        free(node);
+        list->bytes_allocated -= sizeof(skiplist_node);
+        update_size(list, 0, 1);
+        removed++;
+        node = next;
+    }
+
+    unlock_list(list);
+    return removed;
+}
+
+void update_size(skiplist *list, long long added, long long removed)
+{
+    // Updates are serialized by the lock, so a single slot suffices
+    size_counter *counter = &list->counters[0];
+    atomic_store_explicit(&counter->added, atomic_load_explicit(&counter->added, memory_order_relaxed) + added, memory_order_relaxed);
+    atomic_store_explicit(&counter->removed, atomic_load_explicit(&counter->removed, memory_order_relaxed) + removed, memory_order_relaxed);
+}
+
+long long size(skiplist *list)
+{
+    long long keys = 0;
+    for (int i = 0; i < SIZE_COUNTERS; i++)
+    {
+        keys += atomic_load(&list->counters[i].added) - atomic_load(&list->counters[i].removed);
+    }
+    return keys;
+}
+
+long long approximate_size(skiplist *list)
+{
+    long long keys = atomic_load_explicit(&list->counters[0].added, memory_order_relaxed) -
+                     atomic_load_explicit(&list->counters[0].removed, memory_order_relaxed);
+    return keys > 0 ? keys : 0;
+}
+
+int search_path_length(skiplist *list, long key)
+{
+    int length = 0;
+    skiplist_node *node = list->header;
+    for (int i = MAX_LEVEL - 1; i >= 0; i--)
+    {
+        while (node->next[i] != NULL)
+        {
+            length++;
+            if (node->next[i]->key >= key)
+            {
+                break;
+            }
+            node = node->next[i];
+        }
+    }
+
+    return length;
+}
+
+void stats(skiplist *list, skiplist_stats *out)
+{
+    lock_list(list);
+    *out = (skiplist_stats){0};
+    for (skiplist_node *node = list->header->next[0]; node != NULL; node = node->next[0])
+    {
+        out->live_keys++;
+        for (int i = 0; i <= node->top_level; i++)
+        {
+            out->nodes_per_level[i]++;
+        }
+    }
+
+    long long step = (out->live_keys + STATS_PROBES - 1) / STATS_PROBES;
+    long long index = 0, probes = 0, total_length = 0;
+    for (skiplist_node *node = list->header->next[0]; node != NULL; node = node->next[0], index++)
+    {
+        if (index % step == 0)
+        {
+            total_length += search_path_length(list, node->key);
+            probes++;
+        }
+    }
+
+    out->avg_search_path_length = probes > 0 ? (double)total_length / probes : 0.0;
+    out->bytes_allocated = list->bytes_allocated;
+    out->marked_nodes = out->bytes_allocated / sizeof(skiplist_node) - 1 - out->live_keys;
+    unlock_list(list);
+}
+
+void for_each(skiplist *list, void (*visit)(long key, int top_level, void *arg), void *arg)
+{
+    lock_list(list);
+    for (skiplist_node *node = list->header->next[0]; node != NULL; node = node->next[0])
+    {
+        visit(node->key, node->top_level, arg);
+    }
+    unlock_list(list);
+}
+
+long build_sorted(skiplist *list, const long *keys, const unsigned char *levels, long count)
+{
+    lock_list(list);
+    skiplist_node *last[MAX_LEVEL];
+    for (int i = 0; i < MAX_LEVEL; i++)
+    {
+        last[i] = list->header;
+    }
+
+    long inserted = 0;
+    for (; inserted < count; inserted++)
+    {
+        skiplist_node *new_node = malloc(sizeof(skiplist_node));
+        if (!new_node)
+        {
+            break;
+        }
+        new_node->key = keys[inserted];
+        new_node->value = NULL;
+        new_node->top_level = levels[inserted];
+        list->bytes_allocated += sizeof(skiplist_node);
+        update_size(list, 1, 0);
+
+        for (int i = 0; i <= new_node->top_level; i++)
+        {
+            last[i]->next[i] = new_node;
+            last[i] = new_node;
+        }
+    }
+
+    for (int i = 0; i < MAX_LEVEL; i++)
+    {
+        last[i]->next[i] = NULL;
+    }
+    unlock_list(list);
+    return inserted;
+}
\ No newline at end of file
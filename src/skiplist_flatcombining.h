@@ -0,0 +1,47 @@
+/**
+ * @file skiplist_flatcombining.h
+ * @author Natalia Tylek (12332258), Marlene Riegel (01620782), Maximilian Kleinegger (12041500)
+ * @date 2025-01-13
+ *
+ * @brief This file imports the necessary libraries and defines the necessary macros
+ *  and the publication slots for the skiplist using flat combining.
+ */
+
+#include <stdio.h>
+#include <stdlib.h>
+#include <limits.h>
+#include <omp.h>
+#include <sched.h>
+#include <stdatomic.h>
+
+#ifndef FLAT_COMBINING
+#define FLAT_COMBINING
+#endif
+
+// Number of publication slots, threads beyond that take the lock directly
+#define FC_SLOTS 256
+// Number of polls of a waiting thread before it yields its core
+#define FC_SPINS 1024
+
+#define FC_ADD 0
+#define FC_REM 1
+#define FC_CON 2
+
+#define LOAD(_a) atomic_load_explicit(_a, memory_order_acquire)
+#define STORE(_a, _e) atomic_store_explicit(_a, _e, memory_order_release)
+#define FAA(_a, _v) atomic_fetch_add_explicit(_a, _v, memory_order_relaxed)
+#define CAS(_a, _e, _d) atomic_compare_exchange_strong_explicit(_a, _e, _d, memory_order_acq_rel, memory_order_acquire)
+
+/**
+ * @brief Publication slot of one thread. The request fields are written by
+ *  the owner before it sets pending, the result is written by the combiner
+ *  before it clears pending. Every slot has its own cache line.
+ */
+typedef struct _fc_slot
+{
+    _Atomic int pending;
+    int op;
+    long key;
+    void *value;
+    int result;
+} __attribute__((aligned(64))) fc_slot;
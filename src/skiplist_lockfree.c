@@ -9,6 +9,26 @@
 #include "skiplist_lockfree.h"
 #include "skiplist.h"
 
+// Size counter slot of the calling thread, the same in every list
+static atomic_int next_counter_slot = 0;
+static _Thread_local int counter_slot = -1;
+
+static size_counter *own_counter(skiplist *list)
+{
+    if (counter_slot < 0)
+    {
+        counter_slot = FAA(&next_counter_slot, 1) % SIZE_COUNTERS;
+    }
+    return &list->counters[counter_slot];
+}
+
+// Nodes are counted in the slot of the allocating thread to keep inserts off a shared cache line
+static void count_allocation(skiplist *list, long long bytes)
+{
+    size_counter *counter = own_counter(list);
+    FAA(&counter->bytes_allocated, bytes);
+}
+
 void init(skiplist *list)
 {
     list->header = (skiplist_node *)malloc(sizeof(skiplist_node));
@@ -20,6 +40,20 @@ void init(skiplist *list)
         STORE(&list->header->next[i], NULL);
     }
 
+    list->counters = aligned_alloc(sizeof(size_counter), (SIZE_COUNTERS + 1) * sizeof(size_counter));
+    if (!list->counters)
+    {
+        fprintf(stderr, "Memory allocation failed for size counters.\n");
+        exit(EXIT_FAILURE);
+    }
+    for (int i = 0; i < SIZE_COUNTERS + 1; i++)
+    {
+        atomic_init(&list->counters[i].added, 0);
+        atomic_init(&list->counters[i].removed, 0);
+        atomic_init(&list->counters[i].published, 0);
+        atomic_init(&list->counters[i].bytes_allocated, 0);
+    }
+
     srand(42);
 }
 
@@ -32,6 +66,7 @@ void clean(skiplist *list)
         free(curr);
         curr = next;
     }
+    free(list->counters);
     free(list->header);
     list->header = NULL;
 }
@@ -88,11 +123,17 @@ retry:
 }
 }
 
-int con(skiplist *list, long key)
+int find_from(skiplist *list, long key, skiplist_node **preds, skiplist_node **succs)
 {
+    // preds hold the predecessors of a smaller key, which are reused as a
+    // finger unless they were removed in the meantime
     skiplist_node *pred = list->header, *curr = NULL, *succ = NULL;
     for (int level = MAX_LEVEL - 1; level >= 0; level--)
     {
+        if (preds[level]->key > pred->key && !ismarked(LOAD(&preds[level]->next[level])))
+        {
+            pred = preds[level];
+        }
         curr = getpointer(LOAD(&pred->next[level]));
         while (1)
         {
@@ -102,12 +143,51 @@ int con(skiplist *list, long key)
 
             while (ismarked(LOAD(&curr->next[level])))
             {
+                if (!CAS(&pred->next[level], &curr, succ))
+                {
+                    return find(list, key, preds, succs);
+                }
                 curr = getpointer(LOAD(&pred->next[level]));
                 if (!curr)
                     break;
                 succ = getpointer(LOAD(&curr->next[level]));
             }
 
+            if (curr != NULL && curr->key < key)
+            {
+                pred = curr;
+                curr = succ;
+            }
+            else
+                break;
+        }
+        preds[level] = pred;
+        succs[level] = curr;
+    }
+    return (curr && curr->key == key);
+}
+
+int con(skiplist *list, long key)
+{
+    skiplist_node *pred = list->header, *curr = NULL, *succ = NULL;
+    for (int level = MAX_LEVEL - 1; level >= 0; level--)
+    {
+        curr = getpointer(LOAD(&pred->next[level]));
+        while (1)
+        {
+            if (!curr)
+                break;
+            succ = getpointer(LOAD(&curr->next[level]));
+
+            while (ismarked(LOAD(&curr->next[level])))
+            {
+                // Step over removed nodes, unlinking them is left to updates
+                curr = succ;
+                if (!curr)
+                    break;
+                succ = getpointer(LOAD(&curr->next[level]));
+            }
+
             if (curr && curr->key < key)
             {
                 pred = curr;
@@ -120,14 +200,13 @@ int con(skiplist *list, long key)
     return (curr && curr->key == key);
 }
 
-int add(skiplist *list, long key, void *value)
+int add_from(skiplist *list, long key, void *value, skiplist_node **preds, skiplist_node **succs)
 {
     int topLevel = randomLevel(P, MAX_LEVEL - 1);
-    skiplist_node *preds[MAX_LEVEL], *succs[MAX_LEVEL];
 
     while (1)
     {
-        int found = find(list, key, preds, succs);
+        int found = find_from(list, key, preds, succs);
         if (found)
             return 0;
 
@@ -162,10 +241,49 @@ int add(skiplist *list, long key, void *value)
             }
         }
 
+        count_allocation(list, sizeof(skiplist_node));
+        update_size(list, 1, 0);
         return 1;
     }
 }
 
+int add(skiplist *list, long key, void *value)
+{
+    skiplist_node *preds[MAX_LEVEL], *succs[MAX_LEVEL];
+    for (int level = 0; level < MAX_LEVEL; level++)
+    {
+        preds[level] = list->header;
+    }
+    return add_from(list, key, value, preds, succs);
+}
+
+long add_sorted_batch(skiplist *list, const long *keys, long n)
+{
+    skiplist_node *preds[MAX_LEVEL], *succs[MAX_LEVEL];
+    for (int level = 0; level < MAX_LEVEL; level++)
+    {
+        preds[level] = list->header;
+    }
+
+    long inserted = 0;
+    for (long j = 0; j < n; j++)
+    {
+        if (j > 0 && keys[j] <= keys[j - 1])
+        {
+            // Not ascending, the finger is no longer in front of the key
+            for (int level = 0; level < MAX_LEVEL; level++)
+            {
+                preds[level] = list->header;
+            }
+        }
+        if (add_from(list, keys[j], NULL, preds, succs) == 1)
+        {
+            inserted++;
+        }
+    }
+    return inserted;
+}
+
 int rem(skiplist *list, long key)
 {
     skiplist_node *preds[MAX_LEVEL], *succs[MAX_LEVEL];
@@ -198,12 +316,302 @@ int rem(skiplist *list, long key)
             if (success)
             {
                 find(list, key, preds, succs);
+                update_size(list, 0, 1);
                 return 1;
             }
-            else if (ismarked(bottomNext))
+            else if (ismarked(LOAD(&nodeToRemove->next[bottomLevel])))
             {
                 return 0;
             }
         }
     }
 }
+
+int remove_node(skiplist *list, skiplist_node *node)
+{
+    for (int level = node->top_level; level >= 1; level--)
+    {
+        skiplist_node *succ = LOAD(&node->next[level]);
+        while (!ismarked(succ))
+        {
+            if (CAS(&node->next[level], &succ, setmark(succ)))
+                break;
+        }
+    }
+
+    skiplist_node *succ = LOAD(&node->next[0]);
+    while (!ismarked(succ))
+    {
+        if (CAS(&node->next[0], &succ, setmark(succ)))
+        {
+            skiplist_node *preds[MAX_LEVEL], *succs[MAX_LEVEL];
+            find(list, node->key, preds, succs);
+            update_size(list, 0, 1);
+            return 1;
+        }
+    }
+    return 0;
+}
+
+long rem_range(skiplist *list, long lo, long hi)
+{
+    skiplist_node *preds[MAX_LEVEL], *succs[MAX_LEVEL];
+    find(list, lo, preds, succs);
+
+    // Mark the whole run first, the marks freeze the links between its nodes
+    long removed = 0;
+    skiplist_node *curr = succs[0];
+    while (curr && curr->key < hi)
+    {
+        for (int level = curr->top_level; level >= 1; level--)
+        {
+            skiplist_node *succ = LOAD(&curr->next[level]);
+            while (!ismarked(succ))
+            {
+                if (CAS(&curr->next[level], &succ, setmark(succ)))
+                    break;
+            }
+        }
+
+        skiplist_node *succ = LOAD(&curr->next[0]);
+        while (!ismarked(succ))
+        {
+            if (CAS(&curr->next[0], &succ, setmark(succ)))
+            {
+                removed++;
+                break;
+            }
+        }
+        curr = getpointer(LOAD(&curr->next[0]));
+    }
+
+    // Then splice out every marked run behind the predecessors with one CAS
+    // per level, leaving anything a concurrent update got in between to find
+    int spliced = 1;
+    for (int level = MAX_LEVEL - 1; level >= 0; level--)
+    {
+        skiplist_node *first = LOAD(&preds[level]->next[level]);
+        if (ismarked(first))
+        {
+            spliced = 0;
+            continue;
+        }
+
+        skiplist_node *last = first;
+        while (last && ismarked(LOAD(&last->next[level])))
+        {
+            last = getpointer(LOAD(&last->next[level]));
+        }
+        if (last != first && !CAS(&preds[level]->next[level], &first, last))
+        {
+            spliced = 0;
+        }
+    }
+    if (!spliced)
+    {
+        find(list, hi, preds, succs);
+    }
+    update_size(list, 0, removed);
+    return removed;
+}
+
+int delete_min(skiplist *list, long *key)
+{
+    skiplist_node *curr = getpointer(LOAD(&list->header->next[0]));
+    while (curr)
+    {
+        if (!ismarked(LOAD(&curr->next[0])) && remove_node(list, curr))
+        {
+            *key = curr->key;
+            return 1;
+        }
+        curr = getpointer(LOAD(&curr->next[0]));
+    }
+    return 0;
+}
+
+int spray_pop(skiplist *list, int threads, long *key)
+{
+    if (threads <= 1)
+        return delete_min(list, key);
+
+    // SprayList parameters: start at height log p + 1, jump up to log^3 p
+    // nodes per level and descend log log p levels after every jump
+    int log_p = 0;
+    while ((2 << log_p) <= threads)
+        log_p++;
+    int log_log_p = 0;
+    while ((2 << log_log_p) <= log_p)
+        log_log_p++;
+    int height = log_p + 1 < MAX_LEVEL ? log_p + 1 : MAX_LEVEL - 1;
+    int jump = log_p * log_p * log_p;
+    int descent = log_log_p > 1 ? log_log_p : 1;
+
+    for (int attempt = 0; attempt < SPRAY_ATTEMPTS; attempt++)
+    {
+        skiplist_node *curr = list->header;
+        int level = height;
+        while (1)
+        {
+            int steps = rand() % (jump + 1);
+            for (int step = 0; step < steps; step++)
+            {
+                skiplist_node *next = getpointer(LOAD(&curr->next[level]));
+                if (!next)
+                    break;
+                curr = next;
+            }
+
+            if (level == 0)
+                break;
+            level = level > descent ? level - descent : 0;
+        }
+
+        if (curr != list->header && !ismarked(LOAD(&curr->next[0])) && remove_node(list, curr))
+        {
+            *key = curr->key;
+            return 1;
+        }
+    }
+    return delete_min(list, key);
+}
+
+void update_size(skiplist *list, long long added, long long removed)
+{
+    size_counter *counter = own_counter(list);
+    if (added)
+        FAA(&counter->added, added);
+    if (removed)
+        FAA(&counter->removed, removed);
+
+    // Publish the keys of the slot once they moved by SIZE_BATCH, the CAS makes
+    // sure that threads sharing the slot publish every change only once
+    long long keys = LOAD(&counter->added) - LOAD(&counter->removed);
+    long long published = LOAD(&counter->published);
+    if ((keys - published >= SIZE_BATCH || published - keys >= SIZE_BATCH) &&
+        CAS(&counter->published, &published, keys))
+    {
+        FAA(&list->counters[SIZE_PUBLISHED].published, keys - published);
+    }
+}
+
+long long size(skiplist *list)
+{
+    long long keys = 0;
+    for (int i = 0; i < SIZE_COUNTERS; i++)
+    {
+        keys += LOAD(&list->counters[i].added) - LOAD(&list->counters[i].removed);
+    }
+    return keys;
+}
+
+long long approximate_size(skiplist *list)
+{
+    long long keys = LOAD(&list->counters[SIZE_PUBLISHED].published);
+    return keys > 0 ? keys : 0;
+}
+
+int search_path_length(skiplist *list, long key)
+{
+    int length = 0;
+    skiplist_node *pred = list->header;
+    for (int level = MAX_LEVEL - 1; level >= 0; level--)
+    {
+        skiplist_node *curr = getpointer(LOAD(&pred->next[level]));
+        while (curr)
+        {
+            length++;
+            if (curr->key >= key)
+                break;
+            pred = curr;
+            curr = getpointer(LOAD(&curr->next[level]));
+        }
+    }
+    return length;
+}
+
+void stats(skiplist *list, skiplist_stats *out)
+{
+    *out = (skiplist_stats){0};
+    skiplist_node *curr = getpointer(LOAD(&list->header->next[0]));
+    while (curr)
+    {
+        if (!ismarked(LOAD(&curr->next[0])))
+        {
+            out->live_keys++;
+            for (int level = 0; level <= curr->top_level; level++)
+            {
+                out->nodes_per_level[level]++;
+            }
+        }
+        curr = getpointer(LOAD(&curr->next[0]));
+    }
+
+    long long step = (out->live_keys + STATS_PROBES - 1) / STATS_PROBES;
+    long long index = 0, probes = 0, total_length = 0;
+    curr = getpointer(LOAD(&list->header->next[0]));
+    while (curr)
+    {
+        if (!ismarked(LOAD(&curr->next[0])) && index++ % step == 0)
+        {
+            total_length += search_path_length(list, curr->key);
+            probes++;
+        }
+        curr = getpointer(LOAD(&curr->next[0]));
+    }
+
+    out->avg_search_path_length = probes > 0 ? (double)total_length / probes : 0.0;
+    out->bytes_allocated = sizeof(skiplist_node);
+    for (int i = 0; i < SIZE_COUNTERS; i++)
+    {
+        out->bytes_allocated += LOAD(&list->counters[i].bytes_allocated);
+    }
+    out->marked_nodes = out->bytes_allocated / sizeof(skiplist_node) - 1 - out->live_keys;
+}
+
+void for_each(skiplist *list, void (*visit)(long key, int top_level, void *arg), void *arg)
+{
+    skiplist_node *curr = getpointer(LOAD(&list->header->next[0]));
+    while (curr)
+    {
+        if (!ismarked(LOAD(&curr->next[0])))
+        {
+            visit(curr->key, curr->top_level, arg);
+        }
+        curr = getpointer(LOAD(&curr->next[0]));
+    }
+}
+
+long build_sorted(skiplist *list, const long *keys, const unsigned char *levels, long count)
+{
+    skiplist_node *last[MAX_LEVEL];
+    for (int level = 0; level < MAX_LEVEL; level++)
+    {
+        last[level] = list->header;
+    }
+
+    long inserted = 0;
+    for (; inserted < count; inserted++)
+    {
+        skiplist_node *newNode = (skiplist_node *)malloc(sizeof(skiplist_node));
+        if (!newNode)
+            break;
+        newNode->key = keys[inserted];
+        newNode->value = NULL;
+        newNode->top_level = levels[inserted];
+
+        for (int level = 0; level <= newNode->top_level; level++)
+        {
+            STORE(&last[level]->next[level], newNode);
+            last[level] = newNode;
+        }
+    }
+
+    for (int level = 0; level < MAX_LEVEL; level++)
+    {
+        STORE(&last[level]->next[level], NULL);
+    }
+    count_allocation(list, inserted * (long long)sizeof(skiplist_node));
+    update_size(list, inserted, 0);
+    return inserted;
+}
\ No newline at end of file
@@ -25,4 +25,8 @@
 
 #define LOAD(_a) atomic_load_explicit(_a, memory_order_acquire)
 #define STORE(_a, _e) atomic_store_explicit(_a, _e, memory_order_release)
+#define FAA(_a, _v) atomic_fetch_add_explicit(_a, _v, memory_order_relaxed)
 #define CAS(_a, _e, _d) atomic_compare_exchange_strong_explicit(_a, _e, _d, memory_order_acq_rel, memory_order_acquire)
+
+// Number of sprays spray_pop tries before falling back to delete_min
+#define SPRAY_ATTEMPTS 4
@@ -0,0 +1,660 @@
+/**
+ * @file skiplist_lockfree_index.c
+ * @author Natalia Tylek (12332258), Marlene Riegel (01620782), Maximilian Kleinegger (12041500)
+ * @date 2025-01-13
+ *
+ * @brief This file implements a lock-free skiplist with decoupled index levels.
+ *  Updates only touch the level-0 list, a new node merely records the height its
+ *  tower should get. A background thread per list walks level 0 once enough keys
+ *  changed since its last walk, links new towers into the index levels, drops
+ *  deleted nodes from them and unlinks deleted nodes from level 0. As a rebuild
+ *  costs a walk over all keys, it is only started after a fixed fraction of the
+ *  keys changed, which bounds its work to a constant per update. Being the only writer of the index levels, it needs
+ *  no CAS there, and searches skip over deleted nodes they meet in the index.
+ */
+
+#include "skiplist_lockfree_index.h"
+#include "skiplist.h"
+
+// Size counter slot of the calling thread, the same in every list
+static atomic_int next_counter_slot = 0;
+static _Thread_local int counter_slot = -1;
+
+static size_counter *own_counter(skiplist *list)
+{
+    if (counter_slot < 0)
+    {
+        counter_slot = FAA(&next_counter_slot, 1) % SIZE_COUNTERS;
+    }
+    return &list->counters[counter_slot];
+}
+
+// Nodes are counted in the slot of the allocating thread to keep inserts off a shared cache line
+static void count_allocation(skiplist *list, long long bytes)
+{
+    size_counter *counter = own_counter(list);
+    FAA(&counter->bytes_allocated, bytes);
+}
+
+void *maintain(void *arg);
+
+void init(skiplist *list)
+{
+    list->header = (skiplist_node *)malloc(sizeof(skiplist_node));
+    list->header->key = INT_MIN;
+    list->header->value = NULL;
+    list->header->top_level = MAX_LEVEL - 1;
+    for (int i = 0; i < MAX_LEVEL; i++)
+    {
+        STORE(&list->header->next[i], NULL);
+    }
+
+    list->counters = aligned_alloc(sizeof(size_counter), (SIZE_COUNTERS + 1) * sizeof(size_counter));
+    if (!list->counters)
+    {
+        fprintf(stderr, "Memory allocation failed for size counters.\n");
+        exit(EXIT_FAILURE);
+    }
+    for (int i = 0; i < SIZE_COUNTERS + 1; i++)
+    {
+        atomic_init(&list->counters[i].added, 0);
+        atomic_init(&list->counters[i].removed, 0);
+        atomic_init(&list->counters[i].published, 0);
+        atomic_init(&list->counters[i].bytes_allocated, 0);
+    }
+
+    srand(42);
+
+    atomic_init(&list->running, 1);
+    if (pthread_create(&list->maintainer, NULL, maintain, list) != 0)
+    {
+        fprintf(stderr, "Starting the index maintenance thread failed.\n");
+        exit(EXIT_FAILURE);
+    }
+}
+
+void clean(skiplist *list)
+{
+    STORE(&list->running, 0);
+    pthread_join(list->maintainer, NULL);
+
+    skiplist_node *curr = getpointer(LOAD(&list->header->next[0]));
+    while (curr)
+    {
+        skiplist_node *next = getpointer(LOAD(&curr->next[0]));
+        free(curr);
+        curr = next;
+    }
+    free(list->counters);
+    free(list->header);
+    list->header = NULL;
+}
+
+int randomLevel(double p, int max_level)
+{
+    int level = 0;
+    while ((rand() / (double)RAND_MAX) < p && level < max_level)
+    {
+        level++;
+    }
+    return level;
+}
+
+void rebuild_index(skiplist *list)
+{
+    skiplist_node *last[MAX_LEVEL];
+    for (int level = 1; level < MAX_LEVEL; level++)
+    {
+        last[level] = list->header;
+    }
+
+    skiplist_node *pred = list->header;
+    skiplist_node *curr = getpointer(LOAD(&list->header->next[0]));
+    while (curr)
+    {
+        skiplist_node *succ = LOAD(&curr->next[0]);
+        if (ismarked(succ))
+        {
+            // Deleted nodes are left out of the index and unlinked from level 0
+            skiplist_node *expected = curr;
+            CAS(&pred->next[0], &expected, getpointer(succ));
+            curr = getpointer(succ);
+            continue;
+        }
+
+        // Only store changed links, such that searches keep their cache lines
+        for (int level = 1; level <= curr->top_level; level++)
+        {
+            if (LOAD(&last[level]->next[level]) != curr)
+            {
+                STORE(&last[level]->next[level], curr);
+            }
+            last[level] = curr;
+        }
+
+        pred = curr;
+        curr = getpointer(succ);
+    }
+
+    for (int level = 1; level < MAX_LEVEL; level++)
+    {
+        if (LOAD(&last[level]->next[level]) != NULL)
+        {
+            STORE(&last[level]->next[level], NULL);
+        }
+    }
+}
+
+void *maintain(void *arg)
+{
+    skiplist *list = arg;
+    struct timespec interval = {.tv_sec = 0, .tv_nsec = MAINTENANCE_INTERVAL_NS};
+    long long rebuilt_at = 0;
+
+    while (LOAD(&list->running))
+    {
+        // The size counters tell how many keys were added and removed so far
+        long long added = 0, removed = 0;
+        for (int i = 0; i < SIZE_COUNTERS; i++)
+        {
+            added += atomic_load_explicit(&list->counters[i].added, memory_order_relaxed);
+            removed += atomic_load_explicit(&list->counters[i].removed, memory_order_relaxed);
+        }
+
+        long long threshold = (added - removed) / REBUILD_FRACTION;
+        if (threshold < REBUILD_MIN_CHANGES)
+            threshold = REBUILD_MIN_CHANGES;
+        if (added + removed - rebuilt_at >= threshold)
+        {
+            rebuilt_at = added + removed;
+            rebuild_index(list);
+        }
+        nanosleep(&interval, NULL);
+    }
+    return NULL;
+}
+
+skiplist_node *search_index(skiplist *list, long key)
+{
+    skiplist_node *pred = list->header;
+    for (int level = MAX_LEVEL - 1; level >= 1; level--)
+    {
+        skiplist_node *curr = LOAD(&pred->next[level]);
+        while (curr && curr->key < key)
+        {
+            // Deleted nodes still lead forward, but are never used as predecessor
+            if (!ismarked(LOAD(&curr->next[0])))
+            {
+                pred = curr;
+            }
+            curr = LOAD(&curr->next[level]);
+        }
+    }
+    return pred;
+}
+
+int find(skiplist *list, long key, skiplist_node **pred_out, skiplist_node **succ_out)
+{
+    skiplist_node *pred = NULL, *curr = NULL, *succ = NULL;
+retry:
+{
+    pred = search_index(list, key);
+    curr = getpointer(LOAD(&pred->next[0]));
+    while (curr)
+    {
+        succ = LOAD(&curr->next[0]);
+        if (ismarked(succ))
+        {
+            if (!CAS(&pred->next[0], &curr, getpointer(succ)))
+            {
+                goto retry;
+            }
+            curr = getpointer(succ);
+            continue;
+        }
+
+        if (curr->key >= key)
+            break;
+        pred = curr;
+        curr = getpointer(succ);
+    }
+
+    *pred_out = pred;
+    *succ_out = curr;
+    return (curr && curr->key == key);
+}
+}
+
+int find_from(skiplist *list, long key, skiplist_node **preds, skiplist_node **succ_out)
+{
+    // preds hold the predecessors of a smaller key on every level, which are
+    // reused as a finger unless they were removed in the meantime
+    skiplist_node *pred = list->header;
+    for (int level = MAX_LEVEL - 1; level >= 1; level--)
+    {
+        if (preds[level]->key > pred->key && !ismarked(LOAD(&preds[level]->next[0])))
+        {
+            pred = preds[level];
+        }
+        skiplist_node *curr = LOAD(&pred->next[level]);
+        while (curr && curr->key < key)
+        {
+            if (!ismarked(LOAD(&curr->next[0])))
+            {
+                pred = curr;
+            }
+            curr = LOAD(&curr->next[level]);
+        }
+        preds[level] = pred;
+    }
+    if (preds[0]->key > pred->key && !ismarked(LOAD(&preds[0]->next[0])))
+    {
+        pred = preds[0];
+    }
+
+    skiplist_node *curr = getpointer(LOAD(&pred->next[0]));
+    while (curr)
+    {
+        skiplist_node *succ = LOAD(&curr->next[0]);
+        if (ismarked(succ))
+        {
+            if (!CAS(&pred->next[0], &curr, getpointer(succ)))
+            {
+                return find(list, key, &preds[0], succ_out);
+            }
+            curr = getpointer(succ);
+            continue;
+        }
+
+        if (curr->key >= key)
+            break;
+        pred = curr;
+        curr = getpointer(succ);
+    }
+
+    preds[0] = pred;
+    *succ_out = curr;
+    return (curr && curr->key == key);
+}
+
+int con(skiplist *list, long key)
+{
+    skiplist_node *curr = getpointer(LOAD(&search_index(list, key)->next[0]));
+    while (curr && curr->key < key)
+    {
+        curr = getpointer(LOAD(&curr->next[0]));
+    }
+    return (curr && curr->key == key && !ismarked(LOAD(&curr->next[0])));
+}
+
+int add_from(skiplist *list, long key, void *value, skiplist_node **preds)
+{
+    skiplist_node *succ;
+    skiplist_node *newNode = NULL;
+
+    while (1)
+    {
+        int found = find_from(list, key, preds, &succ);
+        if (found)
+        {
+            if (newNode)
+            {
+                free(newNode);
+            }
+            return 0;
+        }
+
+        if (!newNode)
+        {
+            newNode = (skiplist_node *)malloc(sizeof(skiplist_node));
+            if (!newNode)
+                return 0;
+            newNode->key = key;
+            newNode->value = value;
+            newNode->top_level = randomLevel(P, MAX_LEVEL - 1);
+            for (int level = 1; level < MAX_LEVEL; level++)
+            {
+                STORE(&newNode->next[level], NULL);
+            }
+        }
+
+        STORE(&newNode->next[0], succ);
+        if (CAS(&preds[0]->next[0], &succ, newNode))
+        {
+            count_allocation(list, sizeof(skiplist_node));
+            update_size(list, 1, 0);
+            return 1;
+        }
+    }
+}
+
+int add(skiplist *list, long key, void *value)
+{
+    skiplist_node *preds[MAX_LEVEL];
+    for (int level = 0; level < MAX_LEVEL; level++)
+    {
+        preds[level] = list->header;
+    }
+    return add_from(list, key, value, preds);
+}
+
+long add_sorted_batch(skiplist *list, const long *keys, long n)
+{
+    skiplist_node *preds[MAX_LEVEL];
+    for (int level = 0; level < MAX_LEVEL; level++)
+    {
+        preds[level] = list->header;
+    }
+
+    long inserted = 0;
+    for (long j = 0; j < n; j++)
+    {
+        if (j > 0 && keys[j] <= keys[j - 1])
+        {
+            // Not ascending, the finger is no longer in front of the key
+            for (int level = 0; level < MAX_LEVEL; level++)
+            {
+                preds[level] = list->header;
+            }
+        }
+        if (add_from(list, keys[j], NULL, preds) == 1)
+        {
+            inserted++;
+        }
+    }
+    return inserted;
+}
+
+int rem(skiplist *list, long key)
+{
+    skiplist_node *pred, *curr;
+
+    int found = find(list, key, &pred, &curr);
+    if (!found)
+        return 0;
+
+    skiplist_node *succ = LOAD(&curr->next[0]);
+    while (!ismarked(succ))
+    {
+        if (CAS(&curr->next[0], &succ, setmark(succ)))
+        {
+            skiplist_node *expected = curr;
+            CAS(&pred->next[0], &expected, succ);
+            update_size(list, 0, 1);
+            return 1;
+        }
+    }
+    return 0;
+}
+
+long rem_range(skiplist *list, long lo, long hi)
+{
+    skiplist_node *pred, *curr;
+    find(list, lo, &pred, &curr);
+
+    // Mark the whole run first, the marks freeze the links between its nodes
+    long removed = 0;
+    while (curr && curr->key < hi)
+    {
+        skiplist_node *succ = LOAD(&curr->next[0]);
+        while (!ismarked(succ))
+        {
+            if (CAS(&curr->next[0], &succ, setmark(succ)))
+            {
+                removed++;
+                break;
+            }
+        }
+        curr = getpointer(LOAD(&curr->next[0]));
+    }
+
+    // Then splice out the marked run behind the predecessor with one CAS,
+    // anything a concurrent update got in between is left to the maintainer
+    skiplist_node *first = LOAD(&pred->next[0]);
+    if (!ismarked(first))
+    {
+        skiplist_node *last = first;
+        while (last && ismarked(LOAD(&last->next[0])))
+        {
+            last = getpointer(LOAD(&last->next[0]));
+        }
+        if (last != first)
+        {
+            CAS(&pred->next[0], &first, last);
+        }
+    }
+    update_size(list, 0, removed);
+    return removed;
+}
+
+int remove_node(skiplist_node *node)
+{
+    // Unlinking is left to later searches and the maintenance thread
+    skiplist_node *succ = LOAD(&node->next[0]);
+    while (!ismarked(succ))
+    {
+        if (CAS(&node->next[0], &succ, setmark(succ)))
+            return 1;
+    }
+    return 0;
+}
+
+int delete_min(skiplist *list, long *key)
+{
+    skiplist_node *pred = list->header;
+    skiplist_node *curr = getpointer(LOAD(&pred->next[0]));
+    while (curr)
+    {
+        skiplist_node *succ = LOAD(&curr->next[0]);
+        if (ismarked(succ))
+        {
+            // Popped nodes pile up at the front, so help unlinking them
+            skiplist_node *expected = curr;
+            CAS(&pred->next[0], &expected, getpointer(succ));
+            curr = getpointer(succ);
+            continue;
+        }
+
+        if (CAS(&curr->next[0], &succ, setmark(succ)))
+        {
+            skiplist_node *expected = curr;
+            CAS(&pred->next[0], &expected, succ);
+            *key = curr->key;
+            update_size(list, 0, 1);
+            return 1;
+        }
+    }
+    return 0;
+}
+
+int spray_pop(skiplist *list, int threads, long *key)
+{
+    if (threads <= 1)
+        return delete_min(list, key);
+
+    // SprayList parameters: start at height log p + 1, jump up to log^3 p
+    // nodes per level and descend log log p levels after every jump
+    int log_p = 0;
+    while ((2 << log_p) <= threads)
+        log_p++;
+    int log_log_p = 0;
+    while ((2 << log_log_p) <= log_p)
+        log_log_p++;
+    int height = log_p + 1 < MAX_LEVEL ? log_p + 1 : MAX_LEVEL - 1;
+    int jump = log_p * log_p * log_p;
+    int descent = log_log_p > 1 ? log_log_p : 1;
+
+    for (int attempt = 0; attempt < SPRAY_ATTEMPTS; attempt++)
+    {
+        skiplist_node *curr = list->header;
+        int level = height;
+        while (1)
+        {
+            int steps = rand() % (jump + 1);
+            for (int step = 0; step < steps; step++)
+            {
+                skiplist_node *next = getpointer(LOAD(&curr->next[level]));
+                if (!next)
+                    break;
+                curr = next;
+            }
+
+            if (level == 0)
+                break;
+            level = level > descent ? level - descent : 0;
+        }
+
+        if (curr != list->header && remove_node(curr))
+        {
+            *key = curr->key;
+            update_size(list, 0, 1);
+            return 1;
+        }
+    }
+    return delete_min(list, key);
+}
+
+void update_size(skiplist *list, long long added, long long removed)
+{
+    size_counter *counter = own_counter(list);
+    if (added)
+        FAA(&counter->added, added);
+    if (removed)
+        FAA(&counter->removed, removed);
+
+    // Publish the keys of the slot once they moved by SIZE_BATCH, the CAS makes
+    // sure that threads sharing the slot publish every change only once
+    long long keys = LOAD(&counter->added) - LOAD(&counter->removed);
+    long long published = LOAD(&counter->published);
+    if ((keys - published >= SIZE_BATCH || published - keys >= SIZE_BATCH) &&
+        CAS(&counter->published, &published, keys))
+    {
+        FAA(&list->counters[SIZE_PUBLISHED].published, keys - published);
+    }
+}
+
+long long size(skiplist *list)
+{
+    long long keys = 0;
+    for (int i = 0; i < SIZE_COUNTERS; i++)
+    {
+        keys += LOAD(&list->counters[i].added) - LOAD(&list->counters[i].removed);
+    }
+    return keys;
+}
+
+long long approximate_size(skiplist *list)
+{
+    long long keys = LOAD(&list->counters[SIZE_PUBLISHED].published);
+    return keys > 0 ? keys : 0;
+}
+
+int search_path_length(skiplist *list, long key)
+{
+    int length = 0;
+    skiplist_node *pred = list->header;
+    for (int level = MAX_LEVEL - 1; level >= 1; level--)
+    {
+        skiplist_node *curr = LOAD(&pred->next[level]);
+        while (curr)
+        {
+            length++;
+            if (curr->key >= key)
+                break;
+            if (!ismarked(LOAD(&curr->next[0])))
+                pred = curr;
+            curr = LOAD(&curr->next[level]);
+        }
+    }
+
+    skiplist_node *curr = getpointer(LOAD(&pred->next[0]));
+    while (curr)
+    {
+        length++;
+        if (curr->key >= key)
+            break;
+        curr = getpointer(LOAD(&curr->next[0]));
+    }
+    return length;
+}
+
+void stats(skiplist *list, skiplist_stats *out)
+{
+    *out = (skiplist_stats){0};
+    skiplist_node *curr = getpointer(LOAD(&list->header->next[0]));
+    while (curr)
+    {
+        if (!ismarked(LOAD(&curr->next[0])))
+        {
+            out->live_keys++;
+            for (int level = 0; level <= curr->top_level; level++)
+            {
+                out->nodes_per_level[level]++;
+            }
+        }
+        curr = getpointer(LOAD(&curr->next[0]));
+    }
+
+    long long step = (out->live_keys + STATS_PROBES - 1) / STATS_PROBES;
+    long long index = 0, probes = 0, total_length = 0;
+    curr = getpointer(LOAD(&list->header->next[0]));
+    while (curr)
+    {
+        if (!ismarked(LOAD(&curr->next[0])) && index++ % step == 0)
+        {
+            total_length += search_path_length(list, curr->key);
+            probes++;
+        }
+        curr = getpointer(LOAD(&curr->next[0]));
+    }
+
+    out->avg_search_path_length = probes > 0 ? (double)total_length / probes : 0.0;
+    out->bytes_allocated = sizeof(skiplist_node);
+    for (int i = 0; i < SIZE_COUNTERS; i++)
+    {
+        out->bytes_allocated += LOAD(&list->counters[i].bytes_allocated);
+    }
+    out->marked_nodes = out->bytes_allocated / sizeof(skiplist_node) - 1 - out->live_keys;
+}
+
+void for_each(skiplist *list, void (*visit)(long key, int top_level, void *arg), void *arg)
+{
+    skiplist_node *curr = getpointer(LOAD(&list->header->next[0]));
+    while (curr)
+    {
+        if (!ismarked(LOAD(&curr->next[0])))
+        {
+            visit(curr->key, curr->top_level, arg);
+        }
+        curr = getpointer(LOAD(&curr->next[0]));
+    }
+}
+
+long build_sorted(skiplist *list, const long *keys, const unsigned char *levels, long count)
+{
+    // Only level 0 is built, the maintenance thread links the towers
+    skiplist_node *last = list->header;
+    long inserted = 0;
+    for (; inserted < count; inserted++)
+    {
+        skiplist_node *newNode = (skiplist_node *)malloc(sizeof(skiplist_node));
+        if (!newNode)
+            break;
+        newNode->key = keys[inserted];
+        newNode->value = NULL;
+        newNode->top_level = levels[inserted];
+        // The maintenance thread may follow the node as soon as it is linked
+        for (int level = 0; level < MAX_LEVEL; level++)
+        {
+            STORE(&newNode->next[level], NULL);
+        }
+
+        STORE(&last->next[0], newNode);
+        last = newNode;
+    }
+
+    STORE(&last->next[0], NULL);
+    count_allocation(list, inserted * (long long)sizeof(skiplist_node));
+    update_size(list, inserted, 0);
+    return inserted;
+}
@@ -0,0 +1,23 @@
+/**
+ * @file skiplist_lockfree_index.h
+ * @author Natalia Tylek (12332258), Marlene Riegel (01620782), Maximilian Kleinegger (12041500)
+ * @date 2025-01-13
+ *
+ * @brief This file imports the necessary libraries and defines the necessary macros
+ *  for the lock-free skiplist whose index levels are maintained in the background.
+ */
+
+#include <pthread.h>
+
+#include "skiplist_lockfree.h"
+
+#ifndef BACKGROUND_INDEX
+#define BACKGROUND_INDEX
+#endif
+
+// Interval at which the maintenance thread checks for changes of level 0
+#define MAINTENANCE_INTERVAL_NS 1000000
+// The index is rebuilt once the keys added and removed since the last rebuild
+// reach 1/REBUILD_FRACTION of the keys in the list, but at least REBUILD_MIN_CHANGES
+#define REBUILD_FRACTION 8
+#define REBUILD_MIN_CHANGES 64
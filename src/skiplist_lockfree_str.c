@@ -0,0 +1,651 @@
+/**
+ * @file skiplist_lockfree_str.c
+ * @author Natalia Tylek (12332258), Marlene Riegel (01620782), Maximilian Kleinegger (12041500)
+ * @date 2025-01-13
+ *
+ * @brief This file implements the lock-free skiplist for variable-length byte-string keys.
+ *  Every node inlines the first 8 key bytes as a big-endian integer prefix, such that
+ *  most comparisons are a single integer compare and the key bytes are only compared
+ *  with memcmp if the prefixes are equal.
+ */
+
+#include "skiplist_lockfree_str.h"
+#include "skiplist.h"
+
+// Size counter slot of the calling thread, the same in every list
+static atomic_int next_counter_slot = 0;
+static _Thread_local int counter_slot = -1;
+
+static size_counter *own_counter(skiplist *list)
+{
+    if (counter_slot < 0)
+    {
+        counter_slot = FAA(&next_counter_slot, 1) % SIZE_COUNTERS;
+    }
+    return &list->counters[counter_slot];
+}
+
+// Nodes are counted in the slot of the allocating thread to keep inserts off a shared cache line
+static void count_allocation(skiplist *list, long long nodes, long long bytes)
+{
+    size_counter *counter = own_counter(list);
+    FAA(&counter->bytes_allocated, bytes);
+    FAA(&counter->nodes_allocated, nodes);
+}
+
+unsigned long key_prefix(const unsigned char *key, size_t length)
+{
+    unsigned long prefix = 0;
+    for (size_t i = 0; i < PREFIX_LENGTH; i++)
+    {
+        prefix = (prefix << 8) | (i < length ? key[i] : 0);
+    }
+    return prefix;
+}
+
+int compare_key(skiplist *list, skiplist_node *node, unsigned long prefix, const unsigned char *key, size_t length)
+{
+    if (list->compare)
+    {
+        return list->compare(node->key, node->length, key, length);
+    }
+
+    if (node->prefix != prefix)
+    {
+        return node->prefix < prefix ? -1 : 1;
+    }
+
+    // Equal prefixes cover the first 8 bytes of both keys
+    size_t common = node->length < length ? node->length : length;
+    if (common > PREFIX_LENGTH)
+    {
+        int result = memcmp(node->key + PREFIX_LENGTH, key + PREFIX_LENGTH, common - PREFIX_LENGTH);
+        if (result != 0)
+        {
+            return result;
+        }
+    }
+    return (node->length > length) - (node->length < length);
+}
+
+int compare_keys(skiplist *list, const unsigned char *a, size_t a_length, const unsigned char *b, size_t b_length)
+{
+    if (list->compare)
+    {
+        return list->compare(a, a_length, b, b_length);
+    }
+
+    int result = memcmp(a, b, a_length < b_length ? a_length : b_length);
+    if (result != 0)
+    {
+        return result;
+    }
+    return (a_length > b_length) - (a_length < b_length);
+}
+
+void init(skiplist *list)
+{
+    list->header = (skiplist_node *)malloc(sizeof(skiplist_node));
+    list->header->key = NULL;
+    list->header->prefix = 0;
+    list->header->length = 0;
+    list->header->value = NULL;
+    list->header->top_level = MAX_LEVEL - 1;
+    for (int i = 0; i < MAX_LEVEL; i++)
+    {
+        STORE(&list->header->next[i], NULL);
+    }
+    list->compare = NULL;
+
+    list->counters = aligned_alloc(sizeof(size_counter), (SIZE_COUNTERS + 1) * sizeof(size_counter));
+    if (!list->counters)
+    {
+        fprintf(stderr, "Memory allocation failed for size counters.\n");
+        exit(EXIT_FAILURE);
+    }
+    for (int i = 0; i < SIZE_COUNTERS + 1; i++)
+    {
+        atomic_init(&list->counters[i].added, 0);
+        atomic_init(&list->counters[i].removed, 0);
+        atomic_init(&list->counters[i].published, 0);
+        atomic_init(&list->counters[i].bytes_allocated, 0);
+        atomic_init(&list->counters[i].nodes_allocated, 0);
+    }
+
+    srand(42);
+}
+
+void clean(skiplist *list)
+{
+    skiplist_node *curr = getpointer(LOAD(&list->header->next[0]));
+    while (curr)
+    {
+        skiplist_node *next = getpointer(LOAD(&curr->next[0]));
+        free(curr);
+        curr = next;
+    }
+    free(list->counters);
+    free(list->header);
+    list->header = NULL;
+}
+
+void set_comparator(skiplist *list, key_comparator compare)
+{
+    list->compare = compare;
+}
+
+int randomLevel(double p, int max_level)
+{
+    int level = 0;
+    while ((rand() / (double)RAND_MAX) < p && level < max_level)
+    {
+        level++;
+    }
+    return level;
+}
+
+int find(skiplist *list, unsigned long prefix, const unsigned char *key, size_t length, skiplist_node **preds, skiplist_node **succs)
+{
+    skiplist_node *pred = NULL, *curr = NULL, *succ = NULL;
+retry:
+{
+    pred = list->header;
+    for (int level = MAX_LEVEL - 1; level >= 0; level--)
+    {
+        curr = getpointer(LOAD(&pred->next[level]));
+        while (1)
+        {
+            if (!curr)
+                break;
+            succ = getpointer(LOAD(&curr->next[level]));
+
+            while (ismarked(LOAD(&curr->next[level])))
+            {
+                if (!CAS(&pred->next[level], &curr, succ))
+                {
+                    goto retry;
+                }
+                curr = getpointer(LOAD(&pred->next[level]));
+                if (!curr)
+                    break;
+                succ = getpointer(LOAD(&curr->next[level]));
+            }
+
+            if (curr != NULL && compare_key(list, curr, prefix, key, length) < 0)
+            {
+                pred = curr;
+                curr = succ;
+            }
+            else
+                break;
+        }
+        preds[level] = pred;
+        succs[level] = curr;
+    }
+    return (curr && compare_key(list, curr, prefix, key, length) == 0);
+}
+}
+
+int find_from(skiplist *list, unsigned long prefix, const unsigned char *key, size_t length, skiplist_node **preds, skiplist_node **succs)
+{
+    // preds hold the predecessors of a smaller key, which are reused as a
+    // finger unless they were removed in the meantime
+    skiplist_node *pred = list->header, *curr = NULL, *succ = NULL;
+    for (int level = MAX_LEVEL - 1; level >= 0; level--)
+    {
+        skiplist_node *finger = preds[level];
+        if (finger != list->header && !ismarked(LOAD(&finger->next[level])) &&
+            (pred == list->header || compare_key(list, finger, pred->prefix, pred->key, pred->length) > 0))
+        {
+            pred = finger;
+        }
+        curr = getpointer(LOAD(&pred->next[level]));
+        while (1)
+        {
+            if (!curr)
+                break;
+            succ = getpointer(LOAD(&curr->next[level]));
+
+            while (ismarked(LOAD(&curr->next[level])))
+            {
+                if (!CAS(&pred->next[level], &curr, succ))
+                {
+                    return find(list, prefix, key, length, preds, succs);
+                }
+                curr = getpointer(LOAD(&pred->next[level]));
+                if (!curr)
+                    break;
+                succ = getpointer(LOAD(&curr->next[level]));
+            }
+
+            if (curr != NULL && compare_key(list, curr, prefix, key, length) < 0)
+            {
+                pred = curr;
+                curr = succ;
+            }
+            else
+                break;
+        }
+        preds[level] = pred;
+        succs[level] = curr;
+    }
+    return (curr && compare_key(list, curr, prefix, key, length) == 0);
+}
+
+int con(skiplist *list, const unsigned char *key, size_t length)
+{
+    unsigned long prefix = key_prefix(key, length);
+    skiplist_node *pred = list->header, *curr = NULL, *succ = NULL;
+    for (int level = MAX_LEVEL - 1; level >= 0; level--)
+    {
+        curr = getpointer(LOAD(&pred->next[level]));
+        while (1)
+        {
+            if (!curr)
+                break;
+            succ = getpointer(LOAD(&curr->next[level]));
+
+            while (ismarked(LOAD(&curr->next[level])))
+            {
+                // Step over removed nodes, unlinking them is left to updates
+                curr = succ;
+                if (!curr)
+                    break;
+                succ = getpointer(LOAD(&curr->next[level]));
+            }
+
+            if (curr && compare_key(list, curr, prefix, key, length) < 0)
+            {
+                pred = curr;
+                curr = succ;
+            }
+            else
+                break;
+        }
+    }
+    return (curr && compare_key(list, curr, prefix, key, length) == 0);
+}
+
+int add_from(skiplist *list, const unsigned char *key, size_t length, void *value, skiplist_node **preds, skiplist_node **succs)
+{
+    unsigned long prefix = key_prefix(key, length);
+    int topLevel = randomLevel(P, MAX_LEVEL - 1);
+
+    while (1)
+    {
+        int found = find_from(list, prefix, key, length, preds, succs);
+        if (found)
+            return 0;
+
+        // The key bytes are stored directly behind the node
+        skiplist_node *newNode = (skiplist_node *)malloc(sizeof(skiplist_node) + length);
+        if (!newNode)
+            return 0;
+        newNode->key = (unsigned char *)(newNode + 1);
+        memcpy(newNode->key, key, length);
+        newNode->prefix = prefix;
+        newNode->length = length;
+        newNode->value = value;
+        newNode->top_level = topLevel;
+
+        for (int level = 0; level <= topLevel; level++)
+        {
+            skiplist_node *succ = succs[level];
+            STORE(&newNode->next[level], succ);
+        }
+
+        if (!CAS(&preds[0]->next[0], &succs[0], newNode))
+        {
+            free(newNode);
+            continue;
+        }
+
+        for (int level = 1; level <= topLevel; level++)
+        {
+            while (1)
+            {
+                if (CAS(&preds[level]->next[level], &succs[level], newNode))
+                {
+                    break;
+                }
+                find(list, prefix, key, length, preds, succs);
+            }
+        }
+
+        count_allocation(list, 1, sizeof(skiplist_node) + length);
+        update_size(list, 1, 0);
+        return 1;
+    }
+}
+
+int add(skiplist *list, const unsigned char *key, size_t length, void *value)
+{
+    skiplist_node *preds[MAX_LEVEL], *succs[MAX_LEVEL];
+    for (int level = 0; level < MAX_LEVEL; level++)
+    {
+        preds[level] = list->header;
+    }
+    return add_from(list, key, length, value, preds, succs);
+}
+
+long add_sorted_batch(skiplist *list, const unsigned char *const *keys, const size_t *lengths, long n)
+{
+    skiplist_node *preds[MAX_LEVEL], *succs[MAX_LEVEL];
+    for (int level = 0; level < MAX_LEVEL; level++)
+    {
+        preds[level] = list->header;
+    }
+
+    long inserted = 0;
+    for (long j = 0; j < n; j++)
+    {
+        if (j > 0 && compare_keys(list, keys[j], lengths[j], keys[j - 1], lengths[j - 1]) <= 0)
+        {
+            // Not ascending, the finger is no longer in front of the key
+            for (int level = 0; level < MAX_LEVEL; level++)
+            {
+                preds[level] = list->header;
+            }
+        }
+        if (add_from(list, keys[j], lengths[j], NULL, preds, succs) == 1)
+        {
+            inserted++;
+        }
+    }
+    return inserted;
+}
+
+int rem(skiplist *list, const unsigned char *key, size_t length)
+{
+    unsigned long prefix = key_prefix(key, length);
+    skiplist_node *preds[MAX_LEVEL], *succs[MAX_LEVEL];
+    skiplist_node *nodeToRemove = NULL;
+    int bottomLevel = 0;
+
+    while (1)
+    {
+        int found = find(list, prefix, key, length, preds, succs);
+        if (!found)
+            return 0;
+        nodeToRemove = getpointer(LOAD(&succs[0]));
+
+        for (int level = nodeToRemove->top_level; level >= 1; level--)
+        {
+            skiplist_node *succ = getpointer(LOAD(&nodeToRemove->next[level]));
+            while (!ismarked(LOAD(&nodeToRemove->next[level])))
+            {
+                CAS(&nodeToRemove->next[level], &succ, setmark(LOAD(&nodeToRemove->next[level])));
+                succ = getpointer(LOAD(&nodeToRemove->next[level]));
+            }
+        }
+
+        skiplist_node *bottomNext = getpointer(LOAD(&nodeToRemove->next[bottomLevel]));
+        while (1)
+        {
+            int success = CAS(&nodeToRemove->next[bottomLevel], &bottomNext, setmark(bottomNext));
+            bottomNext = getpointer(LOAD(&nodeToRemove->next[bottomLevel]));
+
+            if (success)
+            {
+                find(list, prefix, key, length, preds, succs);
+                update_size(list, 0, 1);
+                return 1;
+            }
+            else if (ismarked(LOAD(&nodeToRemove->next[bottomLevel])))
+            {
+                return 0;
+            }
+        }
+    }
+}
+
+void copy_key(skiplist_node *node, unsigned char *key, size_t capacity, size_t *length)
+{
+    memcpy(key, node->key, node->length < capacity ? node->length : capacity);
+    *length = node->length;
+}
+
+int remove_node(skiplist *list, skiplist_node *node)
+{
+    for (int level = node->top_level; level >= 1; level--)
+    {
+        skiplist_node *succ = LOAD(&node->next[level]);
+        while (!ismarked(succ))
+        {
+            if (CAS(&node->next[level], &succ, setmark(succ)))
+                break;
+        }
+    }
+
+    skiplist_node *succ = LOAD(&node->next[0]);
+    while (!ismarked(succ))
+    {
+        if (CAS(&node->next[0], &succ, setmark(succ)))
+        {
+            skiplist_node *preds[MAX_LEVEL], *succs[MAX_LEVEL];
+            find(list, node->prefix, node->key, node->length, preds, succs);
+            update_size(list, 0, 1);
+            return 1;
+        }
+    }
+    return 0;
+}
+
+long rem_range(skiplist *list, const unsigned char *lo, size_t lo_length, const unsigned char *hi, size_t hi_length)
+{
+    unsigned long hi_prefix = key_prefix(hi, hi_length);
+    skiplist_node *preds[MAX_LEVEL], *succs[MAX_LEVEL];
+    find(list, key_prefix(lo, lo_length), lo, lo_length, preds, succs);
+
+    // Mark the whole run first, the marks freeze the links between its nodes
+    long removed = 0;
+    skiplist_node *curr = succs[0];
+    while (curr && compare_key(list, curr, hi_prefix, hi, hi_length) < 0)
+    {
+        for (int level = curr->top_level; level >= 1; level--)
+        {
+            skiplist_node *succ = LOAD(&curr->next[level]);
+            while (!ismarked(succ))
+            {
+                if (CAS(&curr->next[level], &succ, setmark(succ)))
+                    break;
+            }
+        }
+
+        skiplist_node *succ = LOAD(&curr->next[0]);
+        while (!ismarked(succ))
+        {
+            if (CAS(&curr->next[0], &succ, setmark(succ)))
+            {
+                removed++;
+                break;
+            }
+        }
+        curr = getpointer(LOAD(&curr->next[0]));
+    }
+
+    // Then splice out every marked run behind the predecessors with one CAS
+    // per level, leaving anything a concurrent update got in between to find
+    int spliced = 1;
+    for (int level = MAX_LEVEL - 1; level >= 0; level--)
+    {
+        skiplist_node *first = LOAD(&preds[level]->next[level]);
+        if (ismarked(first))
+        {
+            spliced = 0;
+            continue;
+        }
+
+        skiplist_node *last = first;
+        while (last && ismarked(LOAD(&last->next[level])))
+        {
+            last = getpointer(LOAD(&last->next[level]));
+        }
+        if (last != first && !CAS(&preds[level]->next[level], &first, last))
+        {
+            spliced = 0;
+        }
+    }
+    if (!spliced)
+    {
+        find(list, hi_prefix, hi, hi_length, preds, succs);
+    }
+    update_size(list, 0, removed);
+    return removed;
+}
+
+int delete_min(skiplist *list, unsigned char *key, size_t capacity, size_t *length)
+{
+    skiplist_node *curr = getpointer(LOAD(&list->header->next[0]));
+    while (curr)
+    {
+        if (!ismarked(LOAD(&curr->next[0])) && remove_node(list, curr))
+        {
+            copy_key(curr, key, capacity, length);
+            return 1;
+        }
+        curr = getpointer(LOAD(&curr->next[0]));
+    }
+    return 0;
+}
+
+int spray_pop(skiplist *list, int threads, unsigned char *key, size_t capacity, size_t *length)
+{
+    if (threads <= 1)
+        return delete_min(list, key, capacity, length);
+
+    // SprayList parameters: start at height log p + 1, jump up to log^3 p
+    // nodes per level and descend log log p levels after every jump
+    int log_p = 0;
+    while ((2 << log_p) <= threads)
+        log_p++;
+    int log_log_p = 0;
+    while ((2 << log_log_p) <= log_p)
+        log_log_p++;
+    int height = log_p + 1 < MAX_LEVEL ? log_p + 1 : MAX_LEVEL - 1;
+    int jump = log_p * log_p * log_p;
+    int descent = log_log_p > 1 ? log_log_p : 1;
+
+    for (int attempt = 0; attempt < SPRAY_ATTEMPTS; attempt++)
+    {
+        skiplist_node *curr = list->header;
+        int level = height;
+        while (1)
+        {
+            int steps = rand() % (jump + 1);
+            for (int step = 0; step < steps; step++)
+            {
+                skiplist_node *next = getpointer(LOAD(&curr->next[level]));
+                if (!next)
+                    break;
+                curr = next;
+            }
+
+            if (level == 0)
+                break;
+            level = level > descent ? level - descent : 0;
+        }
+
+        if (curr != list->header && !ismarked(LOAD(&curr->next[0])) && remove_node(list, curr))
+        {
+            copy_key(curr, key, capacity, length);
+            return 1;
+        }
+    }
+    return delete_min(list, key, capacity, length);
+}
+
+void update_size(skiplist *list, long long added, long long removed)
+{
+    size_counter *counter = own_counter(list);
+    if (added)
+        FAA(&counter->added, added);
+    if (removed)
+        FAA(&counter->removed, removed);
+
+    // Publish the keys of the slot once they moved by SIZE_BATCH, the CAS makes
+    // sure that threads sharing the slot publish every change only once
+    long long keys = LOAD(&counter->added) - LOAD(&counter->removed);
+    long long published = LOAD(&counter->published);
+    if ((keys - published >= SIZE_BATCH || published - keys >= SIZE_BATCH) &&
+        CAS(&counter->published, &published, keys))
+    {
+        FAA(&list->counters[SIZE_PUBLISHED].published, keys - published);
+    }
+}
+
+long long size(skiplist *list)
+{
+    long long keys = 0;
+    for (int i = 0; i < SIZE_COUNTERS; i++)
+    {
+        keys += LOAD(&list->counters[i].added) - LOAD(&list->counters[i].removed);
+    }
+    return keys;
+}
+
+long long approximate_size(skiplist *list)
+{
+    long long keys = LOAD(&list->counters[SIZE_PUBLISHED].published);
+    return keys > 0 ? keys : 0;
+}
+
+int search_path_length(skiplist *list, skiplist_node *node)
+{
+    int length = 0;
+    skiplist_node *pred = list->header;
+    for (int level = MAX_LEVEL - 1; level >= 0; level--)
+    {
+        skiplist_node *curr = getpointer(LOAD(&pred->next[level]));
+        while (curr)
+        {
+            length++;
+            if (compare_key(list, curr, node->prefix, node->key, node->length) >= 0)
+                break;
+            pred = curr;
+            curr = getpointer(LOAD(&curr->next[level]));
+        }
+    }
+    return length;
+}
+
+void stats(skiplist *list, skiplist_stats *out)
+{
+    *out = (skiplist_stats){0};
+    skiplist_node *curr = getpointer(LOAD(&list->header->next[0]));
+    while (curr)
+    {
+        if (!ismarked(LOAD(&curr->next[0])))
+        {
+            out->live_keys++;
+            for (int level = 0; level <= curr->top_level; level++)
+            {
+                out->nodes_per_level[level]++;
+            }
+        }
+        curr = getpointer(LOAD(&curr->next[0]));
+    }
+
+    long long step = (out->live_keys + STATS_PROBES - 1) / STATS_PROBES;
+    long long index = 0, probes = 0, total_length = 0;
+    curr = getpointer(LOAD(&list->header->next[0]));
+    while (curr)
+    {
+        if (!ismarked(LOAD(&curr->next[0])) && index++ % step == 0)
+        {
+            total_length += search_path_length(list, curr);
+            probes++;
+        }
+        curr = getpointer(LOAD(&curr->next[0]));
+    }
+
+    out->avg_search_path_length = probes > 0 ? (double)total_length / probes : 0.0;
+    out->bytes_allocated = sizeof(skiplist_node);
+    long long nodes_allocated = 1;
+    for (int i = 0; i < SIZE_COUNTERS; i++)
+    {
+        out->bytes_allocated += LOAD(&list->counters[i].bytes_allocated);
+        nodes_allocated += LOAD(&list->counters[i].nodes_allocated);
+    }
+    out->marked_nodes = nodes_allocated - 1 - out->live_keys;
+}
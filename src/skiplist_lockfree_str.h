@@ -0,0 +1,18 @@
+/**
+ * @file skiplist_lockfree_str.h
+ * @author Natalia Tylek (12332258), Marlene Riegel (01620782), Maximilian Kleinegger (12041500)
+ * @date 2025-01-13
+ *
+ * @brief This file imports the necessary libraries and defines the necessary macros
+ *  for the lock-free skiplist with variable-length byte-string keys.
+ */
+
+#include <string.h>
+
+#include "skiplist_lockfree.h"
+
+#ifndef STRING_KEYS
+#define STRING_KEYS
+#endif
+
+#define PREFIX_LENGTH 8
@@ -14,6 +14,19 @@ void init(skiplist *list)
     list->header->key = INT_MIN;
     list->header->value = NULL;
     list->header->top_level = MAX_LEVEL - 1;
+    list->bytes_allocated = sizeof(skiplist_node);
+
+    list->counters = aligned_alloc(sizeof(size_counter), SIZE_COUNTERS * sizeof(size_counter));
+    if (!list->counters)
+    {
+        fprintf(stderr, "Memory allocation failed for size counters.\n");
+        exit(EXIT_FAILURE);
+    }
+    for (int i = 0; i < SIZE_COUNTERS; i++)
+    {
+        atomic_init(&list->counters[i].added, 0);
+        atomic_init(&list->counters[i].removed, 0);
+    }
 
     for (int i = 0; i < MAX_LEVEL; i++)
     {
@@ -31,6 +44,7 @@ void clean(skiplist *list)
         node = next;
     }
 
+    free(list->counters);
     free(list->header);
 }
 
@@ -70,6 +84,8 @@ int add(skiplist *list, long key, void *value)
     new_node->key = key;
     new_node->value = value;
     new_node->top_level = topLevel;
+    list->bytes_allocated += sizeof(skiplist_node);
+    update_size(list, 1, 0);
 
     for (int i = 0; i <= topLevel; i++)
     {
@@ -107,6 +123,8 @@ int rem(skiplist *list, long key)
         }
 
         free(node);
+        list->bytes_allocated -= sizeof(skiplist_node);
+        update_size(list, 0, 1);
         return 1;
     }
     return 0;
@@ -124,4 +142,248 @@ int con(skiplist *list, long key)
     }
 
     return node->next[0] != NULL && node->next[0]->key == key;
+}
+
+int delete_min(skiplist *list, long *key)
+{
+    skiplist_node *node = list->header->next[0];
+    if (node == NULL)
+    {
+        return 0;
+    }
+
+    // The minimum is the first node on every level of its tower
+    for (int i = 0; i <= node->top_level; i++)
+    {
+        list->header->next[i] = node->next[i];
+    }
+
+    *key = node->key;
+    free(node);
+    list->bytes_allocated -= sizeof(skiplist_node);
+    update_size(list, 0, 1);
+    return 1;
+}
+
+int spray_pop(skiplist *list, int threads, long *key)
+{
+    // There are no concurrent pops to spread, so the exact minimum is taken
+    (void)threads;
+    return delete_min(list, key);
+}
+
+void find_from(skiplist *list, long key, skiplist_node **update)
+{
+    // update holds the predecessors of a smaller key, which are reused as a
+    // finger, such that only the gap to the previous key is walked
+    skiplist_node *node = list->header;
+    for (int i = MAX_LEVEL - 1; i >= 0; i--)
+    {
+        if (update[i]->key > node->key)
+        {
+            node = update[i];
+        }
+        while (node->next[i] != NULL && node->next[i]->key < key)
+        {
+            node = node->next[i];
+        }
+        update[i] = node;
+    }
+}
+
+long add_sorted_batch(skiplist *list, const long *keys, long n)
+{
+    skiplist_node *update[MAX_LEVEL];
+    for (int i = 0; i < MAX_LEVEL; i++)
+    {
+        update[i] = list->header;
+    }
+
+    long inserted = 0;
+    for (long j = 0; j < n; j++)
+    {
+        if (j > 0 && keys[j] <= keys[j - 1])
+        {
+            // Not ascending, the finger is no longer in front of the key
+            for (int i = 0; i < MAX_LEVEL; i++)
+            {
+                update[i] = list->header;
+            }
+        }
+
+        find_from(list, keys[j], update);
+        if (update[0]->next[0] != NULL && update[0]->next[0]->key == keys[j])
+        {
+            continue;
+        }
+
+        int topLevel = randomLevel(P, MAX_LEVEL);
+        skiplist_node *new_node = malloc(sizeof(skiplist_node));
+        new_node->key = keys[j];
+        new_node->value = NULL;
+        new_node->top_level = topLevel;
+        list->bytes_allocated += sizeof(skiplist_node);
+        update_size(list, 1, 0);
+
+        for (int i = 0; i <= topLevel; i++)
+        {
+            new_node->next[i] = update[i]->next[i];
+            update[i]->next[i] = new_node;
+        }
+        inserted++;
+    }
+
+    return inserted;
+}
+
+long rem_range(skiplist *list, long lo, long hi)
+{
+    skiplist_node *update[MAX_LEVEL];
+    skiplist_node *node = list->header;
+    for (int i = MAX_LEVEL - 1; i >= 0; i--)
+    {
+        while (node->next[i] != NULL && node->next[i]->key < lo)
+        {
+            node = node->next[i];
+        }
+        update[i] = node;
+    }
+
+    // All nodes in front of the current one are removed already, so it
+    // directly follows the predecessors of lo on every level of its tower
+    long removed = 0;
+    node = node->next[0];
+    while (node != NULL && node->key < hi)
+    {
+        skiplist_node *next = node->next[0];
+        for (int i = 0; i <= node->top_level; i++)
+        {
+            update[i]->next[i] = node->next[i];
+        }
+
+        free(node);
+        list->bytes_allocated -= sizeof(skiplist_node);
+        update_size(list, 0, 1);
+        removed++;
+        node = next;
+    }
+
+    return removed;
+}
+
+void update_size(skiplist *list, long long added, long long removed)
+{
+    // Updates are serialized, so a single slot suffices
+    size_counter *counter = &list->counters[0];
+    atomic_store_explicit(&counter->added, atomic_load_explicit(&counter->added, memory_order_relaxed) + added, memory_order_relaxed);
+    atomic_store_explicit(&counter->removed, atomic_load_explicit(&counter->removed, memory_order_relaxed) + removed, memory_order_relaxed);
+}
+
+long long size(skiplist *list)
+{
+    long long keys = 0;
+    for (int i = 0; i < SIZE_COUNTERS; i++)
+    {
+        keys += atomic_load(&list->counters[i].added) - atomic_load(&list->counters[i].removed);
+    }
+    return keys;
+}
+
+long long approximate_size(skiplist *list)
+{
+    long long keys = atomic_load_explicit(&list->counters[0].added, memory_order_relaxed) -
+                     atomic_load_explicit(&list->counters[0].removed, memory_order_relaxed);
+    return keys > 0 ? keys : 0;
+}
+
+int search_path_length(skiplist *list, long key)
+{
+    int length = 0;
+    skiplist_node *node = list->header;
+    for (int i = MAX_LEVEL - 1; i >= 0; i--)
+    {
+        while (node->next[i] != NULL)
+        {
+            length++;
+            if (node->next[i]->key >= key)
+            {
+                break;
+            }
+            node = node->next[i];
+        }
+    }
+
+    return length;
+}
+
+void stats(skiplist *list, skiplist_stats *out)
+{
+    *out = (skiplist_stats){0};
+    for (skiplist_node *node = list->header->next[0]; node != NULL; node = node->next[0])
+    {
+        out->live_keys++;
+        for (int i = 0; i <= node->top_level; i++)
+        {
+            out->nodes_per_level[i]++;
+        }
+    }
+
+    long long step = (out->live_keys + STATS_PROBES - 1) / STATS_PROBES;
+    long long index = 0, probes = 0, total_length = 0;
+    for (skiplist_node *node = list->header->next[0]; node != NULL; node = node->next[0], index++)
+    {
+        if (index % step == 0)
+        {
+            total_length += search_path_length(list, node->key);
+            probes++;
+        }
+    }
+
+    out->avg_search_path_length = probes > 0 ? (double)total_length / probes : 0.0;
+    out->bytes_allocated = list->bytes_allocated;
+    out->marked_nodes = out->bytes_allocated / sizeof(skiplist_node) - 1 - out->live_keys;
+}
+
+void for_each(skiplist *list, void (*visit)(long key, int top_level, void *arg), void *arg)
+{
+    for (skiplist_node *node = list->header->next[0]; node != NULL; node = node->next[0])
+    {
+        visit(node->key, node->top_level, arg);
+    }
+}
+
+long build_sorted(skiplist *list, const long *keys, const unsigned char *levels, long count)
+{
+    skiplist_node *last[MAX_LEVEL];
+    for (int i = 0; i < MAX_LEVEL; i++)
+    {
+        last[i] = list->header;
+    }
+
+    long inserted = 0;
+    for (; inserted < count; inserted++)
+    {
+        skiplist_node *new_node = malloc(sizeof(skiplist_node));
+        if (!new_node)
+        {
+            break;
+        }
+        new_node->key = keys[inserted];
+        new_node->value = NULL;
+        new_node->top_level = levels[inserted];
+        list->bytes_allocated += sizeof(skiplist_node);
+        update_size(list, 1, 0);
+
+        for (int i = 0; i <= new_node->top_level; i++)
+        {
+            last[i]->next[i] = new_node;
+            last[i] = new_node;
+        }
+    }
+
+    for (int i = 0; i < MAX_LEVEL; i++)
+    {
+        last[i]->next[i] = NULL;
+    }
+    return inserted;
 }
\ No newline at end of file
@@ -0,0 +1,741 @@
+/**
+ * @file skiplist_shm.c
+ * @author Natalia Tylek (12332258), Marlene Riegel (01620782), Maximilian Kleinegger (12041500)
+ * @date 2025-01-13
+ *
+ * @brief This file implements the lock-free skiplist inside a shared memory segment,
+ *  such that multiple processes can attach to it and operate on it concurrently.
+ *  Nodes are taken from an in-segment bump allocator and, as in the lock-free
+ *  variant, removed nodes are never reclaimed.
+ */
+
+#include "skiplist_shm.h"
+#include "skiplist.h"
+
+skiplist_node *shm_alloc(skiplist *list)
+{
+    shm_segment *segment = list->segment;
+    long offset = FAA(&segment->top, (long)sizeof(skiplist_node));
+    if (offset + (long)sizeof(skiplist_node) > segment->size)
+    {
+        return NULL;
+    }
+    return (skiplist_node *)((char *)segment + offset);
+}
+
+// Offset of the size counters and of the first node in a segment
+#define COUNTERS_OFFSET ((long)(sizeof(shm_segment) + 63) & ~63L)
+#define NODES_OFFSET (COUNTERS_OFFSET + (SIZE_COUNTERS + 1) * (long)sizeof(size_counter))
+
+void shm_format(skiplist *list, shm_segment *segment, long size)
+{
+    // The size counters are placed in front of all nodes
+    segment->size = size;
+    segment->counters = COUNTERS_OFFSET;
+    atomic_init(&segment->top, NODES_OFFSET);
+    atomic_init(&segment->next_counter_slot, 0);
+    list->segment = segment;
+    list->counters = (size_counter *)((char *)segment + segment->counters);
+    for (int i = 0; i < SIZE_COUNTERS + 1; i++)
+    {
+        atomic_init(&list->counters[i].added, 0);
+        atomic_init(&list->counters[i].removed, 0);
+        atomic_init(&list->counters[i].published, 0);
+        atomic_init(&list->counters[i].spare, 0L);
+    }
+
+    list->header = shm_alloc(list);
+    list->header->key = INT_MIN;
+    list->header->value = NULL;
+    list->header->top_level = MAX_LEVEL - 1;
+    for (int i = 0; i < MAX_LEVEL; i++)
+    {
+        STORE(&list->header->next[i], 0L);
+    }
+
+    segment->header = getoffset(list, list->header);
+    atomic_thread_fence(memory_order_release);
+    segment->magic = SHM_MAGIC;
+}
+
+void init(skiplist *list)
+{
+    shm_segment *segment = mmap(NULL, SHM_DEFAULT_SIZE, PROT_READ | PROT_WRITE,
+                                MAP_SHARED | MAP_ANONYMOUS | MAP_NORESERVE, -1, 0);
+    if (segment == MAP_FAILED)
+    {
+        fprintf(stderr, "Memory mapping failed for shared skiplist.\n");
+        exit(EXIT_FAILURE);
+    }
+    shm_format(list, segment, SHM_DEFAULT_SIZE);
+
+    srand(42);
+}
+
+void clean(skiplist *list)
+{
+    munmap(list->segment, list->segment->size);
+    list->segment = NULL;
+    list->header = NULL;
+    list->counters = NULL;
+}
+
+skiplist *shm_create(const char *name, long size)
+{
+    // The segment must at least hold its counters and the header node
+    if (size < NODES_OFFSET + (long)sizeof(skiplist_node))
+    {
+        fprintf(stderr, "Segment size %ld is below the minimum of %ld bytes.\n",
+                size, NODES_OFFSET + (long)sizeof(skiplist_node));
+        return NULL;
+    }
+
+    skiplist *list = malloc(sizeof(skiplist));
+    if (!list)
+        return NULL;
+
+    int fd = shm_open(name, O_CREAT | O_EXCL | O_RDWR, 0600);
+    if (fd == -1)
+    {
+        free(list);
+        return NULL;
+    }
+
+    shm_segment *segment = MAP_FAILED;
+    if (ftruncate(fd, size) == 0)
+    {
+        segment = mmap(NULL, size, PROT_READ | PROT_WRITE, MAP_SHARED, fd, 0);
+    }
+    close(fd);
+
+    if (segment == MAP_FAILED)
+    {
+        shm_unlink(name);
+        free(list);
+        return NULL;
+    }
+
+    shm_format(list, segment, size);
+    return list;
+}
+
+skiplist *shm_attach(const char *name)
+{
+    skiplist *list = malloc(sizeof(skiplist));
+    if (!list)
+        return NULL;
+
+    int fd = shm_open(name, O_RDWR, 0600);
+    if (fd == -1)
+    {
+        free(list);
+        return NULL;
+    }
+
+    struct stat st;
+    shm_segment *segment = MAP_FAILED;
+    if (fstat(fd, &st) == 0 && st.st_size >= (long)sizeof(shm_segment))
+    {
+        segment = mmap(NULL, st.st_size, PROT_READ | PROT_WRITE, MAP_SHARED, fd, 0);
+    }
+    close(fd);
+
+    if (segment == MAP_FAILED)
+    {
+        free(list);
+        return NULL;
+    }
+
+    if (segment->magic != SHM_MAGIC || segment->size != st.st_size)
+    {
+        munmap(segment, st.st_size);
+        free(list);
+        return NULL;
+    }
+    atomic_thread_fence(memory_order_acquire);
+
+    list->segment = segment;
+    list->header = getnode(list, segment->header);
+    list->counters = (size_counter *)((char *)segment + segment->counters);
+    return list;
+}
+
+void shm_detach(skiplist *list)
+{
+    clean(list);
+    free(list);
+}
+
+int shm_destroy(const char *name)
+{
+    return shm_unlink(name);
+}
+
+int randomLevel(double p, int max_level)
+{
+    int level = 0;
+    while ((rand() / (double)RAND_MAX) < p && level < max_level)
+    {
+        level++;
+    }
+    return level;
+}
+
+int find(skiplist *list, long key, skiplist_node **preds, skiplist_node **succs)
+{
+    skiplist_node *pred = NULL, *curr = NULL, *succ = NULL;
+retry:
+{
+    pred = list->header;
+    for (int level = MAX_LEVEL - 1; level >= 0; level--)
+    {
+        curr = getnode(list, LOAD(&pred->next[level]));
+        while (1)
+        {
+            if (!curr)
+                break;
+            succ = getnode(list, LOAD(&curr->next[level]));
+
+            while (ismarked(LOAD(&curr->next[level])))
+            {
+                long expected = getoffset(list, curr);
+                if (!CAS(&pred->next[level], &expected, getoffset(list, succ)))
+                {
+                    goto retry;
+                }
+                curr = getnode(list, LOAD(&pred->next[level]));
+                if (!curr)
+                    break;
+                succ = getnode(list, LOAD(&curr->next[level]));
+            }
+
+            if (curr != NULL && curr->key < key)
+            {
+                pred = curr;
+                curr = succ;
+            }
+            else
+                break;
+        }
+        preds[level] = pred;
+        succs[level] = curr;
+    }
+    return (curr && curr->key == key);
+}
+}
+
+int find_from(skiplist *list, long key, skiplist_node **preds, skiplist_node **succs)
+{
+    // preds hold the predecessors of a smaller key, which are reused as a
+    // finger unless they were removed in the meantime
+    skiplist_node *pred = list->header, *curr = NULL, *succ = NULL;
+    for (int level = MAX_LEVEL - 1; level >= 0; level--)
+    {
+        if (preds[level]->key > pred->key && !ismarked(LOAD(&preds[level]->next[level])))
+        {
+            pred = preds[level];
+        }
+        curr = getnode(list, LOAD(&pred->next[level]));
+        while (1)
+        {
+            if (!curr)
+                break;
+            succ = getnode(list, LOAD(&curr->next[level]));
+
+            while (ismarked(LOAD(&curr->next[level])))
+            {
+                long expected = getoffset(list, curr);
+                if (!CAS(&pred->next[level], &expected, getoffset(list, succ)))
+                {
+                    return find(list, key, preds, succs);
+                }
+                curr = getnode(list, LOAD(&pred->next[level]));
+                if (!curr)
+                    break;
+                succ = getnode(list, LOAD(&curr->next[level]));
+            }
+
+            if (curr != NULL && curr->key < key)
+            {
+                pred = curr;
+                curr = succ;
+            }
+            else
+                break;
+        }
+        preds[level] = pred;
+        succs[level] = curr;
+    }
+    return (curr && curr->key == key);
+}
+
+int con(skiplist *list, long key)
+{
+    skiplist_node *pred = list->header, *curr = NULL, *succ = NULL;
+    for (int level = MAX_LEVEL - 1; level >= 0; level--)
+    {
+        curr = getnode(list, LOAD(&pred->next[level]));
+        while (1)
+        {
+            if (!curr)
+                break;
+            succ = getnode(list, LOAD(&curr->next[level]));
+
+            while (ismarked(LOAD(&curr->next[level])))
+            {
+                // Step over removed nodes, unlinking them is left to updates
+                curr = succ;
+                if (!curr)
+                    break;
+                succ = getnode(list, LOAD(&curr->next[level]));
+            }
+
+            if (curr && curr->key < key)
+            {
+                pred = curr;
+                curr = succ;
+            }
+            else
+                break;
+        }
+    }
+    return (curr && curr->key == key);
+}
+
+// Size counter slot of the calling thread in the segment it last updated. Slots
+// are claimed from the segment, such that they are unique across processes
+static _Thread_local shm_segment *counter_segment = NULL;
+static _Thread_local int counter_slot = -1;
+
+static size_counter *own_counter(skiplist *list)
+{
+    if (counter_segment != list->segment)
+    {
+        counter_slot = FAA(&list->segment->next_counter_slot, 1) % SIZE_COUNTERS;
+        counter_segment = list->segment;
+    }
+    return &list->counters[counter_slot];
+}
+
+int add_from(skiplist *list, long key, void *value, skiplist_node **preds, skiplist_node **succs)
+{
+    int topLevel = randomLevel(P, MAX_LEVEL - 1);
+    skiplist_node *newNode = NULL;
+
+    while (1)
+    {
+        int found = find_from(list, key, preds, succs);
+        if (found)
+        {
+            // Nodes cannot be handed back to the bump allocator, so a node
+            // whose first CAS failed is kept in the slot for the next insert
+            long empty = 0;
+            if (newNode)
+                CAS(&own_counter(list)->spare, &empty, getoffset(list, newNode));
+            return 0;
+        }
+
+        if (!newNode)
+        {
+            long spare = atomic_exchange_explicit(&own_counter(list)->spare, 0L, memory_order_acquire);
+            newNode = getnode(list, spare);
+            if (!newNode)
+                newNode = shm_alloc(list);
+            if (!newNode)
+                return 0;
+            newNode->key = key;
+            newNode->value = value;
+            newNode->top_level = topLevel;
+        }
+
+        for (int level = 0; level <= topLevel; level++)
+        {
+            STORE(&newNode->next[level], getoffset(list, succs[level]));
+        }
+
+        long expected = getoffset(list, succs[0]);
+        if (!CAS(&preds[0]->next[0], &expected, getoffset(list, newNode)))
+        {
+            continue;
+        }
+
+        for (int level = 1; level <= topLevel; level++)
+        {
+            while (1)
+            {
+                expected = getoffset(list, succs[level]);
+                if (CAS(&preds[level]->next[level], &expected, getoffset(list, newNode)))
+                {
+                    break;
+                }
+                find(list, key, preds, succs);
+            }
+        }
+
+        update_size(list, 1, 0);
+        return 1;
+    }
+}
+
+int add(skiplist *list, long key, void *value)
+{
+    skiplist_node *preds[MAX_LEVEL], *succs[MAX_LEVEL];
+    for (int level = 0; level < MAX_LEVEL; level++)
+    {
+        preds[level] = list->header;
+    }
+    return add_from(list, key, value, preds, succs);
+}
+
+long add_sorted_batch(skiplist *list, const long *keys, long n)
+{
+    skiplist_node *preds[MAX_LEVEL], *succs[MAX_LEVEL];
+    for (int level = 0; level < MAX_LEVEL; level++)
+    {
+        preds[level] = list->header;
+    }
+
+    long inserted = 0;
+    for (long j = 0; j < n; j++)
+    {
+        if (j > 0 && keys[j] <= keys[j - 1])
+        {
+            // Not ascending, the finger is no longer in front of the key
+            for (int level = 0; level < MAX_LEVEL; level++)
+            {
+                preds[level] = list->header;
+            }
+        }
+        if (add_from(list, keys[j], NULL, preds, succs) == 1)
+        {
+            inserted++;
+        }
+    }
+    return inserted;
+}
+
+int rem(skiplist *list, long key)
+{
+    skiplist_node *preds[MAX_LEVEL], *succs[MAX_LEVEL];
+
+    int found = find(list, key, preds, succs);
+    if (!found)
+        return 0;
+    skiplist_node *nodeToRemove = succs[0];
+
+    for (int level = nodeToRemove->top_level; level >= 1; level--)
+    {
+        long succ = LOAD(&nodeToRemove->next[level]);
+        while (!ismarked(succ))
+        {
+            if (CAS(&nodeToRemove->next[level], &succ, setmark(succ)))
+                break;
+        }
+    }
+
+    long bottomNext = LOAD(&nodeToRemove->next[0]);
+    while (!ismarked(bottomNext))
+    {
+        if (CAS(&nodeToRemove->next[0], &bottomNext, setmark(bottomNext)))
+        {
+            find(list, key, preds, succs);
+            update_size(list, 0, 1);
+            return 1;
+        }
+    }
+    return 0;
+}
+
+int remove_node(skiplist *list, skiplist_node *node)
+{
+    for (int level = node->top_level; level >= 1; level--)
+    {
+        long succ = LOAD(&node->next[level]);
+        while (!ismarked(succ))
+        {
+            if (CAS(&node->next[level], &succ, setmark(succ)))
+                break;
+        }
+    }
+
+    long succ = LOAD(&node->next[0]);
+    while (!ismarked(succ))
+    {
+        if (CAS(&node->next[0], &succ, setmark(succ)))
+        {
+            skiplist_node *preds[MAX_LEVEL], *succs[MAX_LEVEL];
+            find(list, node->key, preds, succs);
+            update_size(list, 0, 1);
+            return 1;
+        }
+    }
+    return 0;
+}
+
+long rem_range(skiplist *list, long lo, long hi)
+{
+    skiplist_node *preds[MAX_LEVEL], *succs[MAX_LEVEL];
+    find(list, lo, preds, succs);
+
+    // Mark the whole run first, the marks freeze the links between its nodes
+    long removed = 0;
+    skiplist_node *curr = succs[0];
+    while (curr && curr->key < hi)
+    {
+        for (int level = curr->top_level; level >= 1; level--)
+        {
+            long succ = LOAD(&curr->next[level]);
+            while (!ismarked(succ))
+            {
+                if (CAS(&curr->next[level], &succ, setmark(succ)))
+                    break;
+            }
+        }
+
+        long succ = LOAD(&curr->next[0]);
+        while (!ismarked(succ))
+        {
+            if (CAS(&curr->next[0], &succ, setmark(succ)))
+            {
+                removed++;
+                break;
+            }
+        }
+        curr = getnode(list, LOAD(&curr->next[0]));
+    }
+
+    // Then splice out every marked run behind the predecessors with one CAS
+    // per level, leaving anything a concurrent update got in between to find
+    int spliced = 1;
+    for (int level = MAX_LEVEL - 1; level >= 0; level--)
+    {
+        long first = LOAD(&preds[level]->next[level]);
+        if (ismarked(first))
+        {
+            spliced = 0;
+            continue;
+        }
+
+        long last = first;
+        while (last && ismarked(LOAD(&getnode(list, last)->next[level])))
+        {
+            last = LOAD(&getnode(list, last)->next[level]) & ~MARK_BIT;
+        }
+        if (last != first && !CAS(&preds[level]->next[level], &first, last))
+        {
+            spliced = 0;
+        }
+    }
+    if (!spliced)
+    {
+        find(list, hi, preds, succs);
+    }
+    update_size(list, 0, removed);
+    return removed;
+}
+
+int delete_min(skiplist *list, long *key)
+{
+    skiplist_node *curr = getnode(list, LOAD(&list->header->next[0]));
+    while (curr)
+    {
+        if (!ismarked(LOAD(&curr->next[0])) && remove_node(list, curr))
+        {
+            *key = curr->key;
+            return 1;
+        }
+        curr = getnode(list, LOAD(&curr->next[0]));
+    }
+    return 0;
+}
+
+int spray_pop(skiplist *list, int threads, long *key)
+{
+    if (threads <= 1)
+        return delete_min(list, key);
+
+    // SprayList parameters: start at height log p + 1, jump up to log^3 p
+    // nodes per level and descend log log p levels after every jump
+    int log_p = 0;
+    while ((2 << log_p) <= threads)
+        log_p++;
+    int log_log_p = 0;
+    while ((2 << log_log_p) <= log_p)
+        log_log_p++;
+    int height = log_p + 1 < MAX_LEVEL ? log_p + 1 : MAX_LEVEL - 1;
+    int jump = log_p * log_p * log_p;
+    int descent = log_log_p > 1 ? log_log_p : 1;
+
+    for (int attempt = 0; attempt < SPRAY_ATTEMPTS; attempt++)
+    {
+        skiplist_node *curr = list->header;
+        int level = height;
+        while (1)
+        {
+            int steps = rand() % (jump + 1);
+            for (int step = 0; step < steps; step++)
+            {
+                skiplist_node *next = getnode(list, LOAD(&curr->next[level]));
+                if (!next)
+                    break;
+                curr = next;
+            }
+
+            if (level == 0)
+                break;
+            level = level > descent ? level - descent : 0;
+        }
+
+        if (curr != list->header && !ismarked(LOAD(&curr->next[0])) && remove_node(list, curr))
+        {
+            *key = curr->key;
+            return 1;
+        }
+    }
+    return delete_min(list, key);
+}
+
+void update_size(skiplist *list, long long added, long long removed)
+{
+    size_counter *counter = own_counter(list);
+    if (added)
+        FAA(&counter->added, added);
+    if (removed)
+        FAA(&counter->removed, removed);
+
+    // Publish the keys of the slot once they moved by SIZE_BATCH, the CAS makes
+    // sure that threads sharing the slot publish every change only once
+    long long keys = LOAD(&counter->added) - LOAD(&counter->removed);
+    long long published = LOAD(&counter->published);
+    if ((keys - published >= SIZE_BATCH || published - keys >= SIZE_BATCH) &&
+        CAS(&counter->published, &published, keys))
+    {
+        FAA(&list->counters[SIZE_PUBLISHED].published, keys - published);
+    }
+}
+
+long long size(skiplist *list)
+{
+    long long keys = 0;
+    for (int i = 0; i < SIZE_COUNTERS; i++)
+    {
+        keys += LOAD(&list->counters[i].added) - LOAD(&list->counters[i].removed);
+    }
+    return keys;
+}
+
+long long approximate_size(skiplist *list)
+{
+    long long keys = LOAD(&list->counters[SIZE_PUBLISHED].published);
+    return keys > 0 ? keys : 0;
+}
+
+int search_path_length(skiplist *list, long key)
+{
+    int length = 0;
+    skiplist_node *pred = list->header;
+    for (int level = MAX_LEVEL - 1; level >= 0; level--)
+    {
+        skiplist_node *curr = getnode(list, LOAD(&pred->next[level]));
+        while (curr)
+        {
+            length++;
+            if (curr->key >= key)
+                break;
+            pred = curr;
+            curr = getnode(list, LOAD(&curr->next[level]));
+        }
+    }
+    return length;
+}
+
+void stats(skiplist *list, skiplist_stats *out)
+{
+    *out = (skiplist_stats){0};
+    skiplist_node *curr = getnode(list, LOAD(&list->header->next[0]));
+    while (curr)
+    {
+        if (!ismarked(LOAD(&curr->next[0])))
+        {
+            out->live_keys++;
+            for (int level = 0; level <= curr->top_level; level++)
+            {
+                out->nodes_per_level[level]++;
+            }
+        }
+        curr = getnode(list, LOAD(&curr->next[0]));
+    }
+
+    long long step = (out->live_keys + STATS_PROBES - 1) / STATS_PROBES;
+    long long index = 0, probes = 0, total_length = 0;
+    curr = getnode(list, LOAD(&list->header->next[0]));
+    while (curr)
+    {
+        if (!ismarked(LOAD(&curr->next[0])) && index++ % step == 0)
+        {
+            total_length += search_path_length(list, curr->key);
+            probes++;
+        }
+        curr = getnode(list, LOAD(&curr->next[0]));
+    }
+
+    out->avg_search_path_length = probes > 0 ? (double)total_length / probes : 0.0;
+    // All nodes from the header up to the top of the bump allocator have been handed out
+    long top = LOAD(&list->segment->top);
+    if (top > list->segment->size)
+        top = list->segment->size;
+    out->bytes_allocated = (top - list->segment->header) / sizeof(skiplist_node) * sizeof(skiplist_node);
+    out->marked_nodes = out->bytes_allocated / sizeof(skiplist_node) - 1 - out->live_keys;
+    for (int i = 0; i < SIZE_COUNTERS; i++)
+    {
+        // Spare nodes are allocated but were never linked
+        if (LOAD(&list->counters[i].spare))
+            out->marked_nodes--;
+    }
+}
+
+void for_each(skiplist *list, void (*visit)(long key, int top_level, void *arg), void *arg)
+{
+    skiplist_node *curr = getnode(list, LOAD(&list->header->next[0]));
+    while (curr)
+    {
+        if (!ismarked(LOAD(&curr->next[0])))
+        {
+            visit(curr->key, curr->top_level, arg);
+        }
+        curr = getnode(list, LOAD(&curr->next[0]));
+    }
+}
+
+long build_sorted(skiplist *list, const long *keys, const unsigned char *levels, long count)
+{
+    skiplist_node *last[MAX_LEVEL];
+    for (int level = 0; level < MAX_LEVEL; level++)
+    {
+        last[level] = list->header;
+    }
+
+    long inserted = 0;
+    for (; inserted < count; inserted++)
+    {
+        skiplist_node *newNode = shm_alloc(list);
+        if (!newNode)
+            break;
+        newNode->key = keys[inserted];
+        newNode->value = NULL;
+        newNode->top_level = levels[inserted];
+
+        for (int level = 0; level <= newNode->top_level; level++)
+        {
+            STORE(&last[level]->next[level], getoffset(list, newNode));
+            last[level] = newNode;
+        }
+    }
+
+    for (int level = 0; level < MAX_LEVEL; level++)
+    {
+        STORE(&last[level]->next[level], 0L);
+    }
+    update_size(list, inserted, 0);
+    return inserted;
+}
\ No newline at end of file
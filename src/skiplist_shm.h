@@ -0,0 +1,89 @@
+/**
+ * @file skiplist_shm.h
+ * @author Natalia Tylek (12332258), Marlene Riegel (01620782), Maximilian Kleinegger (12041500)
+ * @date 2025-01-13
+ *
+ * @brief This file imports the necessary libraries and defines the necessary macros
+ *  and the segment layout for the lock-free skiplist living in shared memory.
+ *  All links are stored as offsets relative to the segment start, such that every
+ *  process can map the segment at a different address.
+ */
+
+#include <stdio.h>
+#include <stdlib.h>
+#include <limits.h>
+#include <omp.h>
+#include <time.h>
+#include <stdatomic.h>
+#include <fcntl.h>
+#include <unistd.h>
+#include <sys/mman.h>
+#include <sys/stat.h>
+
+#define SHARED_MEMORY
+
+#define SHM_MAGIC 0x534b49504c495354L
+#define SHM_DEFAULT_SIZE (1L << 32)
+
+#define MARK_BIT 0x1L
+
+#define getnode(_list, _offset) ((skiplist_node *)(((_offset) & ~MARK_BIT) ? (char *)(_list)->segment + ((_offset) & ~MARK_BIT) : NULL))
+#define getoffset(_list, _node) ((_node) ? (long)((char *)(_node) - (char *)(_list)->segment) : 0L)
+#define ismarked(_offset) (((_offset) & MARK_BIT) != 0x0)
+#define setmark(_offset) ((_offset) | MARK_BIT)
+
+#define LOAD(_a) atomic_load_explicit(_a, memory_order_acquire)
+#define STORE(_a, _e) atomic_store_explicit(_a, _e, memory_order_release)
+#define FAA(_a, _v) atomic_fetch_add_explicit(_a, _v, memory_order_relaxed)
+#define CAS(_a, _e, _d) atomic_compare_exchange_strong_explicit(_a, _e, _d, memory_order_acq_rel, memory_order_acquire)
+
+// Number of sprays spray_pop tries before falling back to delete_min
+#define SPRAY_ATTEMPTS 4
+
+typedef struct _segment
+{
+    long magic;
+    long size;
+    long header;
+    long counters;
+    atomic_int next_counter_slot;
+    _Atomic long top;
+} shm_segment;
+
+struct _list;
+
+/**
+ * @brief Creates a named shared memory segment and initializes an empty skiplist in it.
+ *
+ * @param name POSIX shared memory name, e.g. "/skiplist".
+ * @param size Size of the segment in bytes, bounding the number of nodes.
+ *
+ * @return Process-local handle to the skiplist, NULL on failure.
+ */
+struct _list *shm_create(const char *name, long size);
+
+/**
+ * @brief Attaches to a skiplist previously created with shm_create.
+ *
+ * @param name POSIX shared memory name of the segment.
+ *
+ * @return Process-local handle to the skiplist, NULL on failure.
+ */
+struct _list *shm_attach(const char *name);
+
+/**
+ * @brief Unmaps the segment and frees the handle. The skiplist stays intact
+ *  for other processes that are still attached.
+ *
+ * @param list Handle returned by shm_create or shm_attach.
+ */
+void shm_detach(struct _list *list);
+
+/**
+ * @brief Removes the named segment. It is freed once the last process detached.
+ *
+ * @param name POSIX shared memory name of the segment.
+ *
+ * @return 0 on success, -1 otherwise.
+ */
+int shm_destroy(const char *name);
@@ -12,10 +12,39 @@ import time
 import datetime
 import json
 
+# Must match MAX_LEVEL in src/skiplist.h
+MAX_LEVEL = 16
+
+# Workloads of the benchmark driver, indexed like the WORKLOAD_* defines in src/library.c
+WORKLOADS = ["set", "queue", "relaxed_queue"]
+
+# Must match BENCH_RESULT_VERSION in src/library.c
+BENCH_RESULT_VERSION = 2
+
+
+# Define the cThreadResult structure
+class cThreadResult(ctypes.Structure):
+    _fields_ = [
+        ("operations", ctypes.c_longlong),
+        ("inserts", ctypes.c_longlong),
+        ("successful_inserts", ctypes.c_longlong),
+        ("deletes", ctypes.c_longlong),
+        ("successful_deletes", ctypes.c_longlong),
+        ("contains", ctypes.c_longlong),
+        ("successful_contains", ctypes.c_longlong),
+        ("time", ctypes.c_double),
+    ]
+
+
+# Per-thread counters, stored as JSON lists in the <field>_per_thread columns
+THREAD_FIELDS = [field for field, _ in cThreadResult._fields_]
+
 
 # Define the cBenchResult structure
 class cBenchResult(ctypes.Structure):
     _fields_ = [
+        ("version", ctypes.c_int),
+        ("threads", ctypes.c_int),
         ("time", ctypes.c_float),
         ("total_operations", ctypes.c_longlong),
         ("total_inserts", ctypes.c_longlong),
@@ -25,15 +54,136 @@ class cBenchResult(ctypes.Structure):
         ("total_contains", ctypes.c_longlong),
         ("successful_contains", ctypes.c_longlong),
         ("basic_correctness_test_success", ctypes.c_int),
-        ("operations_per_thread", ctypes.c_longlong * 64),
+        ("live_keys", ctypes.c_longlong),
+        ("marked_nodes", ctypes.c_longlong),
+        ("nodes_per_level", ctypes.c_longlong * MAX_LEVEL),
+        ("avg_search_path_length", ctypes.c_double),
+        ("bytes_allocated", ctypes.c_longlong),
+        ("prefill_time", ctypes.c_double),
+        ("size", ctypes.c_longlong),
+        ("size_check_success", ctypes.c_int),
+        ("size_update_ns", ctypes.c_double),
+        ("size_overhead", ctypes.c_double),
+    ]
+
+
+# Define the cSkiplistStats structure
+class cSkiplistStats(ctypes.Structure):
+    _fields_ = [
+        ("live_keys", ctypes.c_longlong),
+        ("marked_nodes", ctypes.c_longlong),
+        ("nodes_per_level", ctypes.c_longlong * MAX_LEVEL),
+        ("avg_search_path_length", ctypes.c_double),
+        ("bytes_allocated", ctypes.c_longlong),
     ]
 
 
+def load_library(lib_path):
+    """
+    Loads a benchmark library and checks that it returns results in the
+    layout of cBenchResult and cThreadResult.
+    """
+    binary = ctypes.CDLL(lib_path)
+    binary.bench_result_version.restype = ctypes.c_int
+    version = binary.bench_result_version()
+    if version != BENCH_RESULT_VERSION:
+        raise RuntimeError(
+            f"{lib_path} returns results of version {version}, expected "
+            f"{BENCH_RESULT_VERSION}; rebuild it with make"
+        )
+    binary.bench.restype = cBenchResult
+    return binary
+
+
+class BenchSession:
+    """
+    Handle to a list that outlives a single measurement. It is created and
+    prefilled once, after which any number of phases with different thread
+    counts and mixes run on the same, aging structure.
+    """
+
+    def __init__(self, binary, basic_testing):
+        self.binary = binary
+        self.binary.session_create.restype = ctypes.c_void_p
+        self.binary.session_create.argtypes = [ctypes.c_int]
+        self.binary.session_prefill.restype = ctypes.c_double
+        self.binary.session_prefill.argtypes = (
+            [ctypes.c_void_p] + [ctypes.c_int] * 5 + [ctypes.c_char_p]
+        )
+        self.binary.session_run_phase.restype = cBenchResult
+        self.binary.session_run_phase.argtypes = (
+            [ctypes.c_void_p, ctypes.c_int, ctypes.c_int]
+            + [ctypes.c_float] * 3
+            + [ctypes.c_int] * 6
+            + [ctypes.POINTER(cThreadResult)]
+        )
+        self.binary.session_destroy.argtypes = [ctypes.c_void_p]
+
+        self.handle = self.binary.session_create(int(basic_testing))
+        self.phases = 0
+        self.prefill_time = 0.0
+
+    def prefill(self, prefill_count, base_range, selection_strategy, seed, prefill_from=None):
+        """
+        Prefills the list, or loads it from the snapshot prefill_from if it exists.
+        The next phase reports the time this took as its prefill_time.
+        """
+        self.prefill_time += self.binary.session_prefill(
+            self.handle,
+            prefill_count,
+            base_range[0],
+            base_range[1],
+            selection_strategy,
+            seed,
+            prefill_from.encode() if prefill_from else None,
+        )
+
+    def run_phase(
+        self,
+        threads,
+        runtime,
+        operations_mix,
+        base_range,
+        disjoint_range,
+        selection_strategy,
+        seed,
+        workload="set",
+    ):
+        per_thread = (cThreadResult * threads)()
+        result = self.binary.session_run_phase(
+            self.handle,
+            threads,
+            runtime,
+            *operations_mix,
+            base_range[0],
+            base_range[1],
+            int(disjoint_range),
+            selection_strategy,
+            seed,
+            WORKLOADS.index(workload),
+            per_thread,
+        )
+        result.per_thread = per_thread[: result.threads]
+        result.prefill_time = self.prefill_time
+        self.prefill_time = 0.0
+        self.phases += 1
+        return result
+
+    def close(self):
+        if self.handle:
+            self.binary.session_destroy(self.handle)
+            self.handle = None
+
+
 class Benchmark:
     """
     Class representing a benchmark. It assumes any benchmark sweeps over some
     parameter xrange using the fixed set of inputs for every point. It simply
     averages the results over the given amount of repetitions.
+
+    With persistent set, the whole sweep runs as phases of a single session
+    of the given library, which is prefilled only once instead of for every
+    point, so later points measure a list aged by all previous ones.
     """
 
     def __init__(
@@ -51,8 +201,14 @@ class Benchmark:
         prefill_count,
         basedir,
         name,
+        prefill_from=None,
+        workload="set",
+        library=None,
+        persistent=False,
     ):
         self.bench_function = bench_function
+        self.library = library
+        self.persistent = persistent
         self.repetitions_per_point = repetitions_per_point
         self.num_of_threads = num_of_threads
         self.base_range = base_range
@@ -69,21 +225,58 @@ class Benchmark:
         self.basic_testing = basic_testing
         self.seed = seed
         self.prefill_count = prefill_count
+        self.prefill_from = prefill_from
+        self.workload = workload
         self.basedir = basedir
         self.name = name
 
         self.data = {}
         self.now = None
+        self.session = None
 
-    def run(self):
+    def result_dir(self):
         """
-        Runs the benchmark and saves the results to CSV files.
+        Returns the directory the results of this benchmark are stored in.
         """
         op_mix = f"{int(self.operations_mix[0])}{int(self.operations_mix[1])}{int(self.operations_mix[2])}"
         range_type = "disjoint" if self.disjoint_range else "shared"
         directory_name = f"{self.name}/{op_mix}_{range_type}"
+        if self.workload != "set":
+            directory_name += f"_{self.workload}"
+        return os.path.join(self.basedir, "data", directory_name)
+
+    def open_session(self):
+        """
+        Creates and prefills the session all following points run on.
+        """
+        self.session = BenchSession(self.library, self.basic_testing)
+        self.session.prefill(
+            self.prefill_count,
+            self.base_range,
+            self.selection_strategy,
+            self.seed,
+            self.prefill_from,
+        )
+        print(f"Prefilled session in {self.session.prefill_time:.3f}s")
+
+    def close_session(self):
+        if self.session is not None:
+            self.session.close()
+            self.session = None
+
+    def run(self):
+        """
+        Runs the benchmark and saves the results to CSV files.
+        """
+        if self.persistent:
+            self.open_session()
+        try:
+            self.run_sweep()
+        finally:
+            self.close_session()
 
-        result_dir = os.path.join(self.basedir, "data", directory_name)
+    def run_sweep(self):
+        result_dir = self.result_dir()
         os.makedirs(result_dir, exist_ok=True)
 
         self.now = datetime.datetime.now().strftime("%Y-%m-%dT%H-%M-%S")
@@ -98,6 +291,7 @@ class Benchmark:
                     [
                         "threads",
                         "repetition",
+                        "phase",
                         "prefill_count",
                         "time",
                         "total_inserts",
@@ -108,35 +302,37 @@ class Benchmark:
                         "successful_contains",
                         "total_operations",
                         "basic_correctness_test_success",
-                        "operations_per_thread",
+                        *[f"{field}_per_thread" for field in THREAD_FIELDS],
+                        "live_keys",
+                        "marked_nodes",
+                        "nodes_per_level",
+                        "avg_search_path_length",
+                        "bytes_allocated",
+                        "prefill_time",
+                        "size",
+                        "size_check_success",
+                        "size_update_ns",
+                        "size_overhead",
                     ]
                 )
 
                 for t in self.num_of_threads:
                     for i in range(self.repetitions_per_point):
-                        result = self.bench_function(
-                            ctypes.c_int(t),
-                            ctypes.c_int(runtime),
-                            ctypes.c_float(self.operations_mix[0]),
-                            ctypes.c_float(self.operations_mix[1]),
-                            ctypes.c_float(self.operations_mix[2]),
-                            ctypes.c_int(self.base_range[0]),
-                            ctypes.c_int(self.base_range[1]),
-                            ctypes.c_int(self.disjoint_range),
-                            ctypes.c_int(self.selection_strategy),
-                            ctypes.c_int(self.prefill_count),
-                            ctypes.c_int(self.basic_testing),
-                            ctypes.c_int(self.seed),
-                        )
+                        result = self.run_point(t, runtime)
+                        phase = self.session.phases - 1 if self.session else 0
 
-                        ops_per_thread = json.dumps(
-                            list(result.operations_per_thread)[:t]
-                        )
+                        per_thread = [
+                            json.dumps(
+                                [getattr(thread, field) for thread in result.per_thread]
+                            )
+                            for field in THREAD_FIELDS
+                        ]
 
                         csv_writer.writerow(
                             [
                                 t,
                                 i,
+                                phase,
                                 self.prefill_count,
                                 result.time,
                                 result.total_inserts,
@@ -147,22 +343,66 @@ class Benchmark:
                                 result.successful_contains,
                                 result.total_operations,
                                 result.basic_correctness_test_success,
-                                ops_per_thread,
+                                *per_thread,
+                                result.live_keys,
+                                result.marked_nodes,
+                                json.dumps(list(result.nodes_per_level)),
+                                result.avg_search_path_length,
+                                result.bytes_allocated,
+                                result.prefill_time,
+                                result.size,
+                                result.size_check_success,
+                                result.size_update_ns,
+                                result.size_overhead,
                             ]
                         )
                         csvfile.flush()
                         del result
 
+    def run_point(self, threads, runtime):
+        """
+        Runs a single measurement with the given thread count and runtime,
+        as the next phase of the session if one is open. The counters of every
+        thread are attached to the result as per_thread.
+        """
+        if self.session is not None:
+            return self.session.run_phase(
+                threads,
+                runtime,
+                self.operations_mix,
+                self.base_range,
+                self.disjoint_range,
+                self.selection_strategy,
+                self.seed,
+                self.workload,
+            )
+        per_thread = (cThreadResult * threads)()
+        result = self.bench_function(
+            ctypes.c_int(threads),
+            ctypes.c_int(runtime),
+            ctypes.c_float(self.operations_mix[0]),
+            ctypes.c_float(self.operations_mix[1]),
+            ctypes.c_float(self.operations_mix[2]),
+            ctypes.c_int(self.base_range[0]),
+            ctypes.c_int(self.base_range[1]),
+            ctypes.c_int(self.disjoint_range),
+            ctypes.c_int(self.selection_strategy),
+            ctypes.c_int(self.prefill_count),
+            ctypes.c_int(self.basic_testing),
+            ctypes.c_int(self.seed),
+            ctypes.c_char_p(self.prefill_from.encode() if self.prefill_from else None),
+            ctypes.c_int(WORKLOADS.index(self.workload)),
+            per_thread,
+        )
+        result.per_thread = per_thread[: result.threads]
+        return result
+
     def write_avg_data(self):
         """
         Processes the CSV files with benchmark results, averages data over
         repetitions for each thread count, and writes to new averages CSV files.
         """
-        op_mix = f"{int(self.operations_mix[0])}{int(self.operations_mix[1])}{int(self.operations_mix[2])}"
-        range_type = "disjoint" if self.disjoint_range else "shared"
-        directory_name = f"{self.name}/{op_mix}_{range_type}"
-
-        result_dir = os.path.join(self.basedir, "data", directory_name)
+        result_dir = self.result_dir()
 
         for runtime in self.runtime_in_sec:
             result_file = os.path.join(result_dir, f"run_{runtime}s_{self.now}.csv")
@@ -177,7 +417,8 @@ class Benchmark:
 
             # Dictionaries to store sums and counts for averaging
             data_map = {}
-            ops_thread_map = {}
+            thread_map = {}
+            level_map = {}
 
             with open(result_file, mode="r") as infile:
                 reader = csv.DictReader(infile)
@@ -196,8 +437,20 @@ class Benchmark:
                             "successful_contains": 0,
                             "total_operations": 0,
                             "basic_correctness_test_success": 0,
+                            "live_keys": 0,
+                            "marked_nodes": 0,
+                            "avg_search_path_length": 0.0,
+                            "bytes_allocated": 0,
+                            "prefill_time": 0.0,
+                            "size": 0,
+                            "size_check_success": 0,
+                            "size_update_ns": 0.0,
+                            "size_overhead": 0.0,
                         }
-                        ops_thread_map[threads] = [0] * threads
+                        thread_map[threads] = {
+                            field: [0] * threads for field in THREAD_FIELDS
+                        }
+                        level_map[threads] = [0] * MAX_LEVEL
 
                     data_map[threads]["time"] += float(row["time"])
                     data_map[threads]["total_inserts"] += int(row["total_inserts"])
@@ -218,11 +471,29 @@ class Benchmark:
                     data_map[threads]["basic_correctness_test_success"] += int(
                         row["basic_correctness_test_success"]
                     )
+                    data_map[threads]["live_keys"] += int(row["live_keys"])
+                    data_map[threads]["marked_nodes"] += int(row["marked_nodes"])
+                    data_map[threads]["avg_search_path_length"] += float(
+                        row["avg_search_path_length"]
+                    )
+                    data_map[threads]["bytes_allocated"] += int(row["bytes_allocated"])
+                    data_map[threads]["prefill_time"] += float(row["prefill_time"])
+                    data_map[threads]["size"] += int(row["size"])
+                    data_map[threads]["size_check_success"] += int(
+                        row["size_check_success"]
+                    )
+                    data_map[threads]["size_update_ns"] += float(row["size_update_ns"])
+                    data_map[threads]["size_overhead"] += float(row["size_overhead"])
+
+                    nodes_per_level = json.loads(row["nodes_per_level"])
+                    for level in range(MAX_LEVEL):
+                        level_map[threads][level] += nodes_per_level[level]
 
                     try:
-                        ops_per_thread = json.loads(row["operations_per_thread"])
-                        for idx in range(threads):
-                            ops_thread_map[threads][idx] += ops_per_thread[idx]
+                        for field in THREAD_FIELDS:
+                            per_thread = json.loads(row[f"{field}_per_thread"])
+                            for idx in range(threads):
+                                thread_map[threads][field][idx] += per_thread[idx]
                     except json.JSONDecodeError as e:
                         print(f"Error decoding JSON for thread {threads}: {e}")
                         continue
@@ -244,7 +515,17 @@ class Benchmark:
                     "successful_contains",
                     "total_operations",
                     "basic_correctness_test_success",
-                    "average_operations_per_thread",
+                    *[f"average_{field}_per_thread" for field in THREAD_FIELDS],
+                    "live_keys",
+                    "marked_nodes",
+                    "average_nodes_per_level",
+                    "avg_search_path_length",
+                    "bytes_allocated",
+                    "prefill_time",
+                    "size",
+                    "size_check_success",
+                    "size_update_ns",
+                    "size_overhead",
                 ]
                 writer = csv.DictWriter(outfile, fieldnames=fieldnames)
                 writer.writeheader()
@@ -272,12 +553,35 @@ class Benchmark:
                             == count
                             else False
                         ),
-                        "average_operations_per_thread": json.dumps(
+                        **{
+                            f"average_{field}_per_thread": json.dumps(
+                                [
+                                    thread_map[threads][field][idx] / count
+                                    for idx in range(threads)
+                                ]
+                            )
+                            for field in THREAD_FIELDS
+                        },
+                        "live_keys": data_map[threads]["live_keys"] / count,
+                        "marked_nodes": data_map[threads]["marked_nodes"] / count,
+                        "average_nodes_per_level": json.dumps(
                             [
-                                ops_thread_map[threads][idx] / count
-                                for idx in range(threads)
+                                level_map[threads][level] / count
+                                for level in range(MAX_LEVEL)
                             ]
                         ),
+                        "avg_search_path_length": data_map[threads][
+                            "avg_search_path_length"
+                        ]
+                        / count,
+                        "bytes_allocated": data_map[threads]["bytes_allocated"]
+                        / count,
+                        "prefill_time": data_map[threads]["prefill_time"] / count,
+                        "size": data_map[threads]["size"] / count,
+                        "size_check_success": data_map[threads]["size_check_success"]
+                        == count,
+                        "size_update_ns": data_map[threads]["size_update_ns"] / count,
+                        "size_overhead": data_map[threads]["size_overhead"] / count,
                     }
                     writer.writerow(avg_data)
 
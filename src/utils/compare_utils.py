@@ -0,0 +1,151 @@
+##
+# @file compare_utils.py
+# @author Natalia Tylek (12332258), Marlene Riegel (01620782), Maximilian Kleinegger (12041500)
+# @date 2025-01-13
+#
+# @brief Utilities for comparing fresh benchmark runs against the stored baselines in data/.
+
+import os
+import csv
+import glob
+import math
+import statistics
+
+from scipy import stats
+
+
+# Names under which the variants with established baselines are stored in data/,
+# all other variants are stored under the name of their library
+NAMES = {
+    "seq": "sequential",
+    "globallocking": "global_lock",
+    "finelocking": "fine_lock",
+    "lockfree": "lock_free",
+    "shm": "shared_memory",
+}
+
+
+def discover_implementations(build_dir):
+    """
+    Returns the names of all skiplist variants built in build_dir, mapped to the
+    paths of their shared libraries.
+    """
+    implementations = {}
+    for lib_path in sorted(glob.glob(os.path.join(build_dir, "library_*.so"))):
+        variant = os.path.basename(lib_path)[len("library_"):-len(".so")]
+        implementations[NAMES.get(variant, variant)] = lib_path
+    return implementations
+
+
+def throughput(row):
+    return float(row["total_operations"]) / float(row["time"])
+
+
+def load_baseline(basedir, implementation, op_mix, range_type, runtime, threads):
+    """
+    Returns the throughput of every repetition with the given thread count from
+    the most recent raw result file of the matching baseline, or an empty list.
+    """
+    range_types = [range_type]
+    if implementation == "sequential":
+        # The sequential baseline is only stored for the shared range
+        range_types.append("shared")
+
+    for candidate in range_types:
+        pattern = os.path.join(
+            basedir, "data", implementation, f"{op_mix}_{candidate}", f"run_{runtime}s_*.csv"
+        )
+        files = sorted(f for f in glob.glob(pattern) if not f.endswith("_average.csv"))
+        if not files:
+            continue
+
+        with open(files[-1], mode="r") as infile:
+            reader = csv.DictReader(infile)
+            return [throughput(row) for row in reader if int(row["threads"]) == threads]
+
+    return []
+
+
+def compare(fresh, baseline, alpha, threshold):
+    """
+    Compares fresh throughput samples against baseline samples using Welch's t-test.
+    If one side has a single sample, e.g. the lock-free baselines recorded with one
+    repetition per point, the other side is tested against it with a one-sample
+    t-test. A difference is only reported as significant if the p-value is below
+    alpha and the relative change of the means exceeds threshold.
+    """
+    result = {
+        "baseline_mean": math.nan,
+        "fresh_mean": statistics.mean(fresh),
+        "change": math.nan,
+        "p_value": math.nan,
+        "status": "no baseline",
+    }
+    if not baseline:
+        return result
+
+    result["baseline_mean"] = statistics.mean(baseline)
+    result["change"] = result["fresh_mean"] / result["baseline_mean"] - 1.0
+
+    if len(fresh) < 2 and len(baseline) < 2:
+        result["status"] = "too few samples"
+        return result
+
+    if len(baseline) < 2:
+        result["p_value"] = stats.ttest_1samp(fresh, baseline[0]).pvalue
+    elif len(fresh) < 2:
+        result["p_value"] = stats.ttest_1samp(baseline, fresh[0]).pvalue
+    else:
+        result["p_value"] = stats.ttest_ind(fresh, baseline, equal_var=False).pvalue
+    if math.isnan(result["p_value"]):
+        # Both sample sets have zero variance
+        significant = result["fresh_mean"] != result["baseline_mean"]
+    else:
+        significant = result["p_value"] < alpha
+
+    if significant and result["change"] <= -threshold:
+        result["status"] = "regression"
+    elif significant and result["change"] >= threshold:
+        result["status"] = "improvement"
+    else:
+        result["status"] = "unchanged"
+    return result
+
+
+def format_table(rows):
+    """
+    Formats the comparison rows as a plain text table.
+    """
+    header = [
+        "implementation",
+        "op_mix",
+        "range",
+        "runtime",
+        "threads",
+        "baseline_ops/s",
+        "fresh_ops/s",
+        "change",
+        "p_value",
+        "status",
+    ]
+    lines = [
+        [
+            row["implementation"],
+            row["op_mix"],
+            row["range_type"],
+            f"{row['runtime']}s",
+            str(row["threads"]),
+            f"{row['baseline_mean']:.0f}",
+            f"{row['fresh_mean']:.0f}",
+            f"{row['change']:+.1%}",
+            f"{row['p_value']:.3f}",
+            row["status"],
+        ]
+        for row in rows
+    ]
+
+    widths = [max(len(line[i]) for line in [header] + lines) for i in range(len(header))]
+    return "\n".join(
+        "  ".join(cell.ljust(width) for cell, width in zip(line, widths)).rstrip()
+        for line in [header] + lines
+    )
@@ -12,6 +12,7 @@ import numpy as np
 import pandas as pd
 import seaborn as sns
 import matplotlib.pyplot as plt
+from scipy.optimize import curve_fit
 
 
 def load_and_prepare_data(base_path="data"):
@@ -52,27 +53,25 @@ def load_and_prepare_data(base_path="data"):
             if col in df.columns:
                 df.drop(columns=[col], inplace=True)
 
-        # Sanitize the 'average_operations_per_thread' column
-        if "average_operations_per_thread" in df.columns:
-
-            def sanitize_average_ops(x):
-                if isinstance(x, str):
-                    try:
-                        evaluated = ast.literal_eval(x)
-                        if isinstance(evaluated, (list, tuple)):
-                            return np.array(evaluated)
-                        else:
-                            return np.nan
-                    except (ValueError, SyntaxError) as e:
+        # Sanitize the list-valued columns
+        def sanitize_average_ops(x):
+            if isinstance(x, str):
+                try:
+                    evaluated = ast.literal_eval(x)
+                    if isinstance(evaluated, (list, tuple)):
+                        return np.array(evaluated)
+                    else:
                         return np.nan
-                elif isinstance(x, (list, tuple, np.ndarray)):
-                    return np.array(x)
-                else:
+                except (ValueError, SyntaxError) as e:
                     return np.nan
+            elif isinstance(x, (list, tuple, np.ndarray)):
+                return np.array(x)
+            else:
+                return np.nan
 
-            df["average_operations_per_thread"] = df[
-                "average_operations_per_thread"
-            ].apply(lambda x: sanitize_average_ops(x))
+        for col in ["average_operations_per_thread", "average_nodes_per_level"]:
+            if col in df.columns:
+                df[col] = df[col].apply(lambda x: sanitize_average_ops(x))
 
         dfs.append(df)
 
@@ -411,3 +410,183 @@ def explode_average_ops_per_thread(df, column='average_operations_per_thread'):
             exploded_rows.append(exploded_row)
 
     return pd.DataFrame(exploded_rows)
+
+
+def usl_model(threads, lam, sigma, kappa):
+    return lam * threads / (1 + sigma * (threads - 1) + kappa * threads * (threads - 1))
+
+
+def amdahl_model(threads, lam, sigma):
+    return lam * threads / (1 + sigma * (threads - 1))
+
+
+def _fit_model(model, threads, throughput, p0, bounds):
+    """
+    Least-squares fit of one scalability model. Returns the parameters and the
+    coefficient of determination, or None if the fit does not converge.
+    """
+    try:
+        params, _ = curve_fit(model, threads, throughput, p0=p0, bounds=bounds, maxfev=10000)
+    except (RuntimeError, ValueError):
+        return None
+
+    residuals = throughput - model(threads, *params)
+    total = np.sum((throughput - np.mean(throughput)) ** 2)
+    r_squared = 1 - np.sum(residuals ** 2) / total if total > 0 else np.nan
+    return params, r_squared
+
+
+def fit_scalability_models(df, projected_threads=(128, 256, 512)):
+    """
+    Fits the Universal Scalability Law X(N) = lambda * N / (1 + sigma * (N - 1) + kappa * N * (N - 1))
+    and Amdahl's law (kappa = 0) to the throughput of every implementation/op_mix/range/runtime
+    series of df. sigma is the contention (serialized fraction) and kappa the coherency
+    (crosstalk) coefficient. The peak of the USL is at N* = sqrt((1 - sigma) / kappa) (at least 1), Amdahl's
+    law only approaches lambda / sigma. USL needs at least 3 and Amdahl at least 2 distinct
+    thread counts, the parameters of a series with fewer are NaN.
+    Returns one row per series with the coefficients, the peak, the R^2 of both fits and
+    the throughput both models project for projected_threads.
+    """
+    df = df.copy()
+    df["throughput"] = df["total_operations"] / df["time"]
+    keys = ["implementation_name", "op_mix", "range_type", "runtime_in_sec"]
+
+    rows = []
+    for key, series in df.groupby(keys):
+        series = series.groupby("threads")["throughput"].mean()
+        threads = series.index.to_numpy(dtype=float)
+        throughput = series.to_numpy(dtype=float)
+
+        row = dict(zip(keys, key))
+        row["measured_threads"] = len(threads)
+        row["max_measured_threads"] = int(threads.max())
+        row["measured_peak_threads"] = int(threads[np.argmax(throughput)])
+        row["measured_peak_throughput"] = throughput.max()
+
+        lam0 = throughput[0] / threads[0]
+        usl = None
+        if len(threads) >= 3:
+            usl = _fit_model(
+                usl_model, threads, throughput, p0=(lam0, 0.1, 0.001), bounds=([0, 0, 0], [np.inf, 1, np.inf])
+            )
+        amdahl = None
+        if len(threads) >= 2:
+            amdahl = _fit_model(
+                amdahl_model, threads, throughput, p0=(lam0, 0.1), bounds=([0, 0], [np.inf, 1])
+            )
+
+        if usl is not None:
+            (lam, sigma, kappa), r_squared = usl
+            if kappa > 0:
+                # Lists that already lose throughput at the second thread peak at one
+                peak = max(1.0, np.sqrt((1 - sigma) / kappa))
+                peak_throughput = usl_model(peak, lam, sigma, kappa)
+            else:
+                # Without coherency the USL reduces to Amdahl's law and never peaks
+                peak = np.inf
+                peak_throughput = lam / sigma if sigma > 0 else np.inf
+            row.update(
+                usl_lambda=lam,
+                usl_sigma=sigma,
+                usl_kappa=kappa,
+                usl_r_squared=r_squared,
+                usl_peak_threads=peak,
+                usl_peak_throughput=peak_throughput,
+            )
+        else:
+            row.update(
+                usl_lambda=np.nan,
+                usl_sigma=np.nan,
+                usl_kappa=np.nan,
+                usl_r_squared=np.nan,
+                usl_peak_threads=np.nan,
+                usl_peak_throughput=np.nan,
+            )
+
+        if amdahl is not None:
+            (lam, sigma), r_squared = amdahl
+            row.update(
+                amdahl_lambda=lam,
+                amdahl_sigma=sigma,
+                amdahl_r_squared=r_squared,
+                amdahl_max_throughput=lam / sigma if sigma > 0 else np.inf,
+            )
+        else:
+            row.update(
+                amdahl_lambda=np.nan,
+                amdahl_sigma=np.nan,
+                amdahl_r_squared=np.nan,
+                amdahl_max_throughput=np.nan,
+            )
+
+        for n in projected_threads:
+            row[f"usl_throughput_{n}"] = (
+                usl_model(n, row["usl_lambda"], row["usl_sigma"], row["usl_kappa"]) if usl is not None else np.nan
+            )
+            row[f"amdahl_throughput_{n}"] = (
+                amdahl_model(n, row["amdahl_lambda"], row["amdahl_sigma"]) if amdahl is not None else np.nan
+            )
+
+        rows.append(row)
+
+    return pd.DataFrame(rows)
+
+
+def plot_scalability_fit(df, op_mix, range_type, runtime, max_threads=None, store=False, base_path="plots"):
+    df_filtered = df.loc[
+        (df["op_mix"] == op_mix)
+        & (df["range_type"] == range_type)
+        & (df["runtime_in_sec"] == runtime)
+    ].copy()
+    df_filtered["throughput"] = df_filtered["total_operations"] / df_filtered["time"]
+
+    fits = fit_scalability_models(df_filtered)
+    fits = fits[fits["usl_lambda"].notna() | fits["amdahl_lambda"].notna()]
+    if fits.empty:
+        raise ValueError(f"Too few thread counts to fit op_mix={op_mix}, range={range_type}, runtime={runtime}s.")
+
+    if max_threads is None:
+        max_threads = 2 * df_filtered["threads"].max()
+    threads = np.linspace(1, max_threads, 200)
+
+    sns.set_theme(style="whitegrid")
+    plt.figure(figsize=(8, 6))
+    palette = sns.color_palette(n_colors=len(fits))
+    for color, (_, fit) in zip(palette, fits.iterrows()):
+        implementation = fit["implementation_name"]
+        measured = df_filtered[df_filtered["implementation_name"] == implementation]
+        measured = measured.groupby("threads")["throughput"].mean()
+        plt.plot(measured.index, measured.values, "o", color=color, label=f"{implementation} (measured)")
+
+        if not np.isnan(fit["usl_lambda"]):
+            plt.plot(
+                threads,
+                usl_model(threads, fit["usl_lambda"], fit["usl_sigma"], fit["usl_kappa"]),
+                "-",
+                color=color,
+                label=f"{implementation} USL (sigma={fit['usl_sigma']:.3g}, kappa={fit['usl_kappa']:.2g})",
+            )
+        if not np.isnan(fit["amdahl_lambda"]):
+            plt.plot(
+                threads,
+                amdahl_model(threads, fit["amdahl_lambda"], fit["amdahl_sigma"]),
+                "--",
+                color=color,
+                label=f"{implementation} Amdahl (sigma={fit['amdahl_sigma']:.3g})",
+            )
+
+    plt.title(f"Scalability Fit for op_mix={op_mix}, range={range_type}, runtime={runtime}s")
+    plt.xlabel("Number of Threads")
+    plt.ylabel("Throughput (ops/sec)")
+    plt.legend(title="Implementation", fontsize=8)
+    plt.tight_layout()
+    if store:
+        os.makedirs(f"{base_path}/all_impl", exist_ok=True)
+        plt.savefig(
+            f"{base_path}/all_impl/benchmark_scalability_fit_{op_mix}_{range_type}_{runtime}s.png"
+        )
+        plt.close()
+    else:
+        plt.show()
+
+    return fits
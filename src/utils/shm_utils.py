@@ -0,0 +1,330 @@
+##
+# @file shm_utils.py
+# @author Natalia Tylek (12332258), Marlene Riegel (01620782), Maximilian Kleinegger (12041500)
+# @date 2025-01-13
+#
+# @brief Utilities for attaching to the shared memory skiplist and benchmarking it with
+# multiple worker processes.
+
+import os
+import time
+import ctypes
+import multiprocessing
+from queue import Empty
+
+from src.utils.bench_utils import (
+    BENCH_RESULT_VERSION,
+    cBenchResult,
+    cThreadResult,
+    cSkiplistStats,
+    Benchmark,
+    WORKLOADS,
+)
+
+# Default size of a shared segment, must be large enough for all nodes ever allocated
+DEFAULT_SEGMENT_SIZE = 1 << 32
+
+# Seconds the workers may take beyond the runtime to start up and report
+WORKER_TIMEOUT_MARGIN = 60
+
+# Seconds between checks whether a worker exited without reporting
+WORKER_POLL_INTERVAL = 0.5
+
+COUNTER_FIELDS = [
+    "total_operations",
+    "total_inserts",
+    "successful_inserts",
+    "total_deletes",
+    "successful_deletes",
+    "total_contains",
+    "successful_contains",
+]
+
+
+class SharedSkiplist:
+    """
+    Process-local handle to a lock-free skiplist living in a named shared memory
+    segment. One process creates the segment, any number of processes may attach
+    to it by name and operate on the same list concurrently.
+    """
+
+    def __init__(self, lib_path, name, size=DEFAULT_SEGMENT_SIZE, create=False):
+        self.binary = ctypes.CDLL(lib_path)
+        self.binary.shm_create.restype = ctypes.c_void_p
+        self.binary.shm_create.argtypes = [ctypes.c_char_p, ctypes.c_long]
+        self.binary.shm_attach.restype = ctypes.c_void_p
+        self.binary.shm_attach.argtypes = [ctypes.c_char_p]
+        self.binary.shm_detach.argtypes = [ctypes.c_void_p]
+        self.binary.shm_destroy.argtypes = [ctypes.c_char_p]
+        self.binary.add.argtypes = [ctypes.c_void_p, ctypes.c_long, ctypes.c_void_p]
+        self.binary.rem.argtypes = [ctypes.c_void_p, ctypes.c_long]
+        self.binary.con.argtypes = [ctypes.c_void_p, ctypes.c_long]
+        self.binary.stats.argtypes = [ctypes.c_void_p, ctypes.POINTER(cSkiplistStats)]
+        self.binary.size.restype = ctypes.c_longlong
+        self.binary.size.argtypes = [ctypes.c_void_p]
+        self.binary.approximate_size.restype = ctypes.c_longlong
+        self.binary.approximate_size.argtypes = [ctypes.c_void_p]
+        self.binary.basic_correctness_test.argtypes = [ctypes.c_void_p]
+        self.binary.prefill_or_load.argtypes = (
+            [ctypes.c_void_p] + [ctypes.c_int] * 5 + [ctypes.c_char_p]
+        )
+        self.binary.snapshot.restype = ctypes.c_long
+        self.binary.snapshot.argtypes = [ctypes.c_void_p, ctypes.c_char_p]
+        self.binary.load_snapshot.restype = ctypes.c_long
+        self.binary.load_snapshot.argtypes = [ctypes.c_void_p, ctypes.c_char_p]
+        self.binary.bench_list.restype = cBenchResult
+        self.binary.bench_list.argtypes = (
+            [ctypes.c_void_p, ctypes.c_int, ctypes.c_int]
+            + [ctypes.c_float] * 3
+            + [ctypes.c_int] * 6
+            + [ctypes.POINTER(cThreadResult)]
+        )
+
+        self.name = name
+        if create:
+            self.handle = self.binary.shm_create(name.encode(), size)
+        else:
+            self.handle = self.binary.shm_attach(name.encode())
+        if not self.handle:
+            action = "create" if create else "attach to"
+            raise OSError(f"Could not {action} shared skiplist: {name}")
+
+    def add(self, key):
+        return self.binary.add(self.handle, key, None) == 1
+
+    def rem(self, key):
+        return self.binary.rem(self.handle, key) == 1
+
+    def con(self, key):
+        return self.binary.con(self.handle, key) == 1
+
+    def size(self):
+        """
+        Returns the number of keys from the size counters, exact only while no
+        process operates on the list.
+        """
+        return self.binary.size(self.handle)
+
+    def approximate_size(self):
+        """
+        Returns the number of keys from a single counter, lagging behind size by
+        less than SIZE_BATCH keys for every process that updated the list.
+        """
+        return self.binary.approximate_size(self.handle)
+
+    def stats(self):
+        """
+        Returns the structural statistics, only valid while no process operates on the list.
+        """
+        out = cSkiplistStats()
+        self.binary.stats(self.handle, ctypes.byref(out))
+        return out
+
+    def basic_correctness_test(self):
+        return self.binary.basic_correctness_test(self.handle)
+
+    def prefill(self, prefill_count, base_range, selection_strategy, seed, prefill_from=None):
+        """
+        Prefills the list, or loads it from the snapshot prefill_from if it exists.
+        """
+        self.binary.prefill_or_load(
+            self.handle,
+            prefill_count,
+            base_range[0],
+            base_range[1],
+            selection_strategy,
+            seed,
+            prefill_from.encode() if prefill_from else None,
+        )
+
+    def snapshot(self, path):
+        return self.binary.snapshot(self.handle, path.encode())
+
+    def load_snapshot(self, path):
+        return self.binary.load_snapshot(self.handle, path.encode())
+
+    def bench(
+        self, threads, runtime, operations_mix, base_range, selection_strategy, seed, workload="set"
+    ):
+        return self.binary.bench_list(
+            self.handle,
+            threads,
+            runtime,
+            *operations_mix,
+            base_range[0],
+            base_range[1],
+            0,
+            selection_strategy,
+            seed,
+            WORKLOADS.index(workload),
+            None,
+        )
+
+    def close(self, destroy=False):
+        """
+        Detaches from the segment and, if requested, removes it from the system.
+        """
+        if self.handle:
+            self.binary.shm_detach(self.handle)
+            self.handle = None
+        if destroy:
+            self.binary.shm_destroy(self.name.encode())
+
+
+def _process_worker(
+    lib_path,
+    name,
+    index,
+    runtime,
+    operations_mix,
+    base_range,
+    selection_strategy,
+    seed,
+    workload,
+    barrier,
+    queue,
+):
+    shared = SharedSkiplist(lib_path, name)
+    barrier.wait()
+    result = shared.bench(
+        1, runtime, operations_mix, base_range, selection_strategy, seed, workload
+    )
+    counters = {field: getattr(result, field) for field in COUNTER_FIELDS}
+    counters["time"] = result.time
+    counters["size_update_ns"] = result.size_update_ns
+    counters["size_overhead"] = result.size_overhead
+    queue.put((index, counters))
+    shared.close()
+
+
+def _collect_counters(workers, queue, timeout):
+    """
+    Collects the counters every worker puts into the queue. Raises a
+    RuntimeError if a worker exits with an error or the workers did not
+    report within timeout seconds, instead of waiting for them forever.
+    """
+    counters = {}
+    deadline = time.monotonic() + timeout
+    while len(counters) < len(workers):
+        try:
+            index, worker_counters = queue.get(timeout=WORKER_POLL_INTERVAL)
+            counters[index] = worker_counters
+            continue
+        except Empty:
+            pass
+        for index, worker in enumerate(workers):
+            if index not in counters and worker.exitcode not in (None, 0):
+                raise RuntimeError(
+                    f"Worker process {index} exited with code {worker.exitcode}"
+                )
+        if time.monotonic() > deadline:
+            missing = sorted(set(range(len(workers))) - set(counters))
+            raise RuntimeError(
+                f"Worker processes {missing} did not report within {timeout} seconds"
+            )
+    return counters
+
+
+class MultiProcessBenchmark(Benchmark):
+    """
+    Benchmark on the shared memory skiplist, where every point of the thread
+    sweep is interpreted as the number of single-threaded worker processes
+    operating on one shared list. Every process pops as a single thread,
+    so the relaxed queue workload takes exact minima here.
+    """
+
+    def __init__(self, lib_path, segment_size=DEFAULT_SEGMENT_SIZE, **kwargs):
+        super().__init__(bench_function=None, **kwargs)
+        self.lib_path = lib_path
+        self.segment_size = segment_size
+
+    def run_point(self, threads, runtime):
+        name = f"/skiplist_bench_{os.getpid()}"
+        shared = SharedSkiplist(self.lib_path, name, self.segment_size, create=True)
+        try:
+            basic_testing_result = 0
+            if self.basic_testing:
+                basic_testing_result = shared.basic_correctness_test()
+            tic = time.perf_counter()
+            shared.prefill(
+                self.prefill_count,
+                self.base_range,
+                self.selection_strategy,
+                self.seed,
+                self.prefill_from,
+            )
+            prefill_time = time.perf_counter() - tic
+
+            ctx = multiprocessing.get_context("spawn")
+            barrier = ctx.Barrier(threads)
+            queue = ctx.Queue()
+            step = (self.base_range[1] - self.base_range[0]) // threads
+            workers = []
+            for index in range(threads):
+                key_range = self.base_range
+                if self.disjoint_range:
+                    key_range = (
+                        self.base_range[0] + index * step,
+                        self.base_range[0] + (index + 1) * step,
+                    )
+                worker = ctx.Process(
+                    target=_process_worker,
+                    args=(
+                        self.lib_path,
+                        name,
+                        index,
+                        runtime,
+                        self.operations_mix,
+                        key_range,
+                        self.selection_strategy,
+                        self.seed + index,
+                        self.workload,
+                        barrier,
+                        queue,
+                    ),
+                )
+                worker.start()
+                workers.append(worker)
+
+            try:
+                counters = _collect_counters(
+                    workers, queue, runtime + WORKER_TIMEOUT_MARGIN
+                )
+            except RuntimeError:
+                # A crashed worker leaves the others waiting at the barrier
+                for worker in workers:
+                    worker.terminate()
+                raise
+            finally:
+                for worker in workers:
+                    worker.join()
+
+            result = cBenchResult()
+            result.basic_correctness_test_success = basic_testing_result
+            result.prefill_time = prefill_time
+            result.time = sum(counters[idx]["time"] for idx in counters) / threads
+            for field in ["size_update_ns", "size_overhead"]:
+                setattr(
+                    result, field, sum(counters[idx][field] for idx in counters) / threads
+                )
+            for field in COUNTER_FIELDS:
+                setattr(result, field, sum(counters[idx][field] for idx in counters))
+            # COUNTER_FIELDS are in the order of the counters of cThreadResult
+            result.version = BENCH_RESULT_VERSION
+            result.threads = threads
+            result.per_thread = [
+                cThreadResult(
+                    *[counters[idx][field] for field in COUNTER_FIELDS],
+                    counters[idx]["time"],
+                )
+                for idx in range(threads)
+            ]
+
+            list_stats = shared.stats()
+            for field, _ in cSkiplistStats._fields_:
+                setattr(result, field, getattr(list_stats, field))
+            result.size = shared.size()
+            result.size_check_success = result.size == list_stats.live_keys
+            return result
+        finally:
+            shared.close(destroy=True)